@@ -0,0 +1,491 @@
+"""Columnar analytics over the workout history.
+
+The history is flattened once into a per-set table (one row per logged set)
+and every metric is a vectorized pandas/NumPy operation over it:
+
+- tonnage: weight x reps for done sets (reps fall back to the template's
+  prescription, e.g. "6/leg" -> 6, when the set didn't record any)
+- e1RM: Epley, weight x (1 + reps / 30), counting reps in reserve from RPE
+  (RPE 8 on a set of 5 ~ 7 reps to failure)
+- weekly volume per category: done sets and tonnage per ISO week
+- acute:chronic workload: rolling 7-day load over the 28-day weekly average
+- per-exercise trends: top load, RPE and e1RM per session, downsampled
+  (LTTB) to a fixed number of points for charting
+
+AnalyticsEngine keeps the table for one history and, when a session is
+appended, only flattens the new entries. pandas is imported here, so the
+app loads this module lazily.
+"""
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+import packed
+import perf
+import storage
+from templates import WORKOUT_TEMPLATES
+
+CATEGORIES = ("warmup", "strength", "power", "tendon", "core", "accessory", "cooldown")
+# On-disk dtype of each per-set column; day/exercise are codes into name lists
+SET_COLUMNS = {
+    "date": "<i8",  # datetime64[ns]
+    "day": "u1",
+    "exercise": "<u2",
+    "set_index": "<i2",
+    "done": "?",
+    "deload": "?",
+    "weight": "<f4",
+    "reps": "<f4",
+    "rpe": "<f4",
+}
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+TREND_METRICS = ("weight", "rpe", "e1rm")
+
+_REPS_RE = re.compile(r"^(\d+)(?:\s*\+\s*(\d+))?(?:\s*[–-]\s*\d+)?(?:/(?:side|arm|leg|each))?(?:\s*@.*)?$")
+
+
+def template_reps(text):
+    """Rep count prescribed by a template string; None for timed/distance work.
+
+    "5" -> 5, "6–8" -> 6 (lower bound), "6/leg" -> 6, "10 + 10" -> 20,
+    "8–10 @ 2‑1‑2" -> 8, "45–60s/each" -> None.
+    """
+    m = _REPS_RE.match((text or "").strip())
+    if not m:
+        return None
+    return int(m.group(1)) + int(m.group(2) or 0)
+
+
+def _template_lookup():
+    category, reps = {}, {}
+    for template in WORKOUT_TEMPLATES.values():
+        for block in template["blocks"]:
+            for item in block["items"]:
+                category[item["name"]] = item["cat"]
+                reps[item["name"]] = template_reps(item["reps"])
+    return category, reps
+
+
+CATEGORY_BY_NAME, REPS_BY_NAME = _template_lookup()
+
+
+def to_datetime(values):
+    # Entry dates are isoformat() strings, with or without microseconds
+    try:
+        return pd.to_datetime(values, format="ISO8601")
+    except (TypeError, ValueError):  # pandas < 2.0
+        return pd.to_datetime(values)
+
+
+def flatten_columns(entries, exercises, days):
+    """Per-set column arrays (SET_COLUMNS dtypes) for `entries`.
+
+    Exercise and day names are stored as codes into the `exercises`/`days`
+    lists, which are extended in place so codes stay stable across appends.
+    """
+    ex_codes = {name: i for i, name in enumerate(exercises)}
+    day_codes = {name: i for i, name in enumerate(days)}
+    cols = {name: [] for name in SET_COLUMNS}
+    entry_dates, entry_rows = [], []
+    for entry in entries:
+        day = entry.get("day") or ""
+        if day not in day_codes:
+            day_codes[day] = len(days)
+            days.append(day)
+        meta = entry.meta if isinstance(entry, packed.PackedEntry) else entry.get("meta")
+        deload = bool((meta or {}).get("deload"))
+        rows = 0
+        for _, name, set_index, done, weight, reps, rpe in packed.set_rows(entry):
+            if not name:
+                continue
+            if name not in ex_codes:
+                ex_codes[name] = len(exercises)
+                exercises.append(name)
+            cols["day"].append(day_codes[day])
+            cols["exercise"].append(ex_codes[name])
+            cols["set_index"].append(set_index)
+            cols["done"].append(done)
+            cols["deload"].append(deload)
+            cols["weight"].append(np.nan if weight is None else weight)
+            reps = reps if reps is not None else REPS_BY_NAME.get(name)
+            cols["reps"].append(np.nan if reps is None else reps)
+            cols["rpe"].append(np.nan if rpe is None else rpe)
+            rows += 1
+        entry_dates.append(entry.get("date"))
+        entry_rows.append(rows)
+    # One date parse per entry, repeated over its sets
+    dates = to_datetime(pd.Series(entry_dates, dtype="object")).to_numpy(dtype="datetime64[ns]").view("int64")
+    cols["date"] = np.repeat(dates, entry_rows)
+    return {name: np.asarray(cols[name], dtype=dtype) for name, dtype in SET_COLUMNS.items()}
+
+
+def frame(cols, exercises, days):
+    """Per-set DataFrame from column arrays (in memory or memory-mapped)."""
+    cat_names = list(CATEGORIES) + ["other"]
+    cat_of_ex = np.array([cat_names.index(CATEGORY_BY_NAME.get(n, "other")) for n in exercises], dtype="int16")
+    ex = cols["exercise"].astype("int32")
+    df = pd.DataFrame({
+        "date": np.asarray(cols["date"]).view("datetime64[ns]"),
+        "day": pd.Categorical.from_codes(cols["day"].astype("int16"), categories=list(days)),
+        "exercise": pd.Categorical.from_codes(ex, categories=list(exercises)),
+        "category": pd.Categorical.from_codes(cat_of_ex[ex] if len(ex) else ex, categories=cat_names),
+        "set_index": cols["set_index"],
+        "done": cols["done"],
+        "weight": cols["weight"].astype("float64"),
+        "reps": cols["reps"].astype("float64"),
+        "rpe": cols["rpe"].astype("float64"),
+        "deload": cols["deload"],
+    })
+    return with_derived(df)
+
+
+def flatten(entries):
+    """Per-set DataFrame for `entries` (JSON dicts or packed entries)."""
+    exercises, days = [], []
+    return frame(flatten_columns(entries, exercises, days), exercises, days)
+
+
+def with_derived(df):
+    """Add the per-set tonnage and e1RM columns (vectorized)."""
+    reps_to_failure = df["reps"] + (10.0 - df["rpe"]).clip(lower=0).fillna(0.0)
+    df["tonnage"] = np.where(df["done"], df["weight"] * df["reps"], 0.0)
+    df["tonnage"] = df["tonnage"].fillna(0.0)
+    df["e1rm"] = df["weight"] * (1.0 + reps_to_failure / 30.0)
+    return df
+
+
+# =============================================================
+# Metrics — each a pure function of the per-set table
+# =============================================================
+
+def weekly_volume(df):
+    """Done sets and tonnage per ISO week and category (long format)."""
+    done = df[df["done"]]
+    if done.empty:
+        return pd.DataFrame(columns=["week_start", "category", "sets", "tonnage"])
+    week_start = done["date"].dt.normalize() - pd.to_timedelta(done["date"].dt.weekday, unit="D")
+    out = (
+        done.assign(week_start=week_start)
+        .groupby(["week_start", "category"], as_index=False, observed=True)
+        .agg(sets=("done", "size"), tonnage=("tonnage", "sum"))
+    )
+    return out
+
+
+def e1rm_table(df):
+    """Best estimated 1RM per exercise, with the set it came from."""
+    logged = df[df["e1rm"].notna() & df["done"]]
+    if logged.empty:
+        return pd.DataFrame(columns=["exercise", "e1rm", "weight", "reps", "rpe", "date"])
+    best = logged.loc[logged.groupby("exercise", observed=True)["e1rm"].idxmax(), ["exercise", "e1rm", "weight", "reps", "rpe", "date"]]
+    return best.astype({"exercise": str}).sort_values("exercise").reset_index(drop=True)
+
+
+def daily_load(df, metric="tonnage"):
+    """Daily workload on a continuous calendar (rest days = 0): "tonnage" or "sets"."""
+    done = df[df["done"]]
+    if done.empty:
+        return pd.Series(dtype="float64")
+    values = done["tonnage"] if metric == "tonnage" else pd.Series(1.0, index=done.index)
+    daily = values.groupby(done["date"].dt.normalize()).sum()
+    return daily.reindex(pd.date_range(daily.index.min(), daily.index.max(), freq="D"), fill_value=0.0)
+
+
+def acute_chronic(df, metric="tonnage", acute=ACUTE_DAYS, chronic=CHRONIC_DAYS):
+    """Rolling acute load, chronic load (per `acute` days) and their ratio, per day.
+
+    The ratio is NaN until a full chronic window of history exists.
+    """
+    daily = daily_load(df, metric)
+    acute_sum = daily.rolling(acute, min_periods=1).sum()
+    chronic_avg = daily.rolling(chronic, min_periods=chronic).sum() * (acute / chronic)
+    ratio = acute_sum / chronic_avg.replace(0.0, np.nan)
+    return pd.DataFrame({"acute": acute_sum, "chronic": chronic_avg, "ratio": ratio})
+
+
+def exercise_sessions(df):
+    """Top load, top RPE and best e1RM per exercise per session (done, loaded sets)."""
+    logged = df[df["done"] & (df["weight"] > 0)]
+    if logged.empty:
+        return pd.DataFrame(columns=["exercise", "date", "weight", "rpe", "e1rm"])
+    return (
+        logged.groupby(["exercise", "date"], observed=True, sort=True)
+        .agg(weight=("weight", "max"), rpe=("rpe", "max"), e1rm=("e1rm", "max"))
+        .reset_index()
+    )
+
+
+def lttb(x, y, n):
+    """Indexes of `n` points that keep the shape of the (x, y) line.
+
+    Largest-Triangle-Three-Buckets: first and last points are kept, the rest
+    is split into n - 2 buckets and each keeps the point spanning the largest
+    triangle with the previously kept point and the next bucket's average.
+    Peaks survive, unlike with striding or bucket means. All indexes when
+    there are no more than `n` points.
+    """
+    size = len(x)
+    if size <= n or n < 3:
+        return np.arange(size)
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    edges = np.linspace(1, size - 1, n - 1).astype(int)  # bucket i is [edges[i], edges[i + 1])
+    keep = np.empty(n, dtype=int)
+    keep[0], keep[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            cx, cy = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def downsample(dates, values, max_points):
+    """(dates, values) without NaNs, LTTB-reduced to at most `max_points`."""
+    dates = np.asarray(dates, dtype="datetime64[ns]")
+    values = np.asarray(values, dtype="float64")
+    ok = ~np.isnan(values)
+    dates, values = dates[ok], values[ok]
+    idx = lttb(dates.view("int64") / 1e9, values, max_points)
+    return dates[idx], values[idx]
+
+
+def exercise_trend(sessions, exercise, max_points):
+    """{metric: (dates, values)} for one exercise from exercise_sessions(), each at most `max_points` long."""
+    rows = sessions[sessions["exercise"] == exercise]
+    return {m: downsample(rows["date"].to_numpy(), rows[m].to_numpy(), max_points) for m in TREND_METRICS}
+
+
+# =============================================================
+# On-disk per-set cache
+# =============================================================
+
+CACHE_FORMAT = 2  # 2: prefix validated by content version
+
+
+class SetCache:
+    """The per-set columns as memory-mappable files next to the history.
+
+    `<dir>/<column>.bin` holds each SET_COLUMNS array as raw little-endian
+    values; `<dir>/meta.json` holds the row count, the exercise/day name
+    tables, and which history prefix is covered: `_count` entries whose
+    storage.history_version is `_version`, so an edit to any covered entry
+    (not just an append or a shorter history) forces a rebuild, even after a
+    restart. Appends write only the new rows past
+    the end of each file, then the meta; a full rebuild writes new files and
+    renames them into place, so a reader never maps a region being rewritten.
+    Bytes past `rows` (a crash mid-append) are ignored and truncated by the
+    next append.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.meta_path = os.path.join(path, "meta.json")
+
+    def column_path(self, name):
+        return os.path.join(self.path, name + ".bin")
+
+    def _meta(self):
+        meta = storage.read_json(self.meta_path, None)
+        return meta if isinstance(meta, dict) and meta.get("format") == CACHE_FORMAT else None
+
+    @staticmethod
+    def covered(meta, history, version):
+        """How many leading history entries `meta` covers, or None if it doesn't match.
+
+        The covered prefix matches when folding the remaining entries onto its
+        version gives `version`: O(1) when current, O(appended) otherwise.
+        """
+        if meta is None or meta["_count"] > len(history):
+            return None
+        if storage.history_version(history[meta["_count"]:], meta["_version"]) != version:
+            return None
+        return meta["_count"]
+
+    def open(self, meta):
+        """Column arrays for `meta`'s rows: read-only memmaps, no parsing."""
+        rows = meta["rows"]
+        cols = {
+            name: np.memmap(self.column_path(name), dtype=dtype, mode="r", shape=(rows,)) if rows else np.zeros(0, dtype)
+            for name, dtype in SET_COLUMNS.items()
+        }
+        return cols, meta["exercises"], meta["days"]
+
+    def prefix(self):
+        """(_count, _version) of the history prefix on disk, or None if there is no cache."""
+        if not os.path.isdir(self.path):
+            return None
+        with storage.file_lock(self.meta_path, shared=True):
+            meta = self._meta()
+        return None if meta is None else (meta["_count"], meta["_version"])
+
+    def load(self, version=None):
+        """(columns, exercises, days) as on disk, or None if there is no cache.
+
+        With `version`, also None unless the cache covers exactly the history
+        prefix with that storage.history_version (for readers that stream the
+        history rather than holding it; see StreamedSetTable).
+        """
+        if not os.path.isdir(self.path):
+            return None
+        with storage.file_lock(self.meta_path, shared=True):
+            meta = self._meta()
+            if meta is None or (version is not None and meta["_version"] != version):
+                return None
+            return self.open(meta)
+
+    def sync(self, history, version=None):
+        """Bring the cache up to `history` (append or rebuild) and open it.
+
+        `version` is storage.history_version(history), computed if not given.
+        """
+        if version is None:
+            version = storage.history_version(history)
+        if os.path.isdir(self.path):
+            # Shared lock: a rebuild elsewhere swaps the column files under the exclusive one
+            with storage.file_lock(self.meta_path, shared=True):
+                meta = self._meta()
+                if meta is not None and meta["_count"] == len(history) and meta["_version"] == version:
+                    return self.open(meta)
+        os.makedirs(self.path, exist_ok=True)
+        with storage.file_lock(self.meta_path):
+            meta = self._meta()  # another worker may have synced meanwhile
+            count = self.covered(meta, history, version)
+            if count == len(history):
+                return self.open(meta)
+            if count is None:
+                meta = {"format": CACHE_FORMAT, "rows": 0, "exercises": [], "days": [], "_count": 0, "_version": ""}
+                cols = flatten_columns(history, meta["exercises"], meta["days"])
+                for name in SET_COLUMNS:
+                    self._replace(name, cols[name])
+            else:
+                cols = flatten_columns(history[count:], meta["exercises"], meta["days"])
+                for name, dtype in SET_COLUMNS.items():
+                    self._append(name, meta["rows"] * np.dtype(dtype).itemsize, cols[name])
+            meta["rows"] += len(cols["date"])
+            meta["_count"] = len(history)
+            meta["_version"] = version
+            storage.write_json(self.meta_path, meta)
+            return self.open(meta)
+
+    def _replace(self, name, values):
+        path = self.column_path(name)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(values.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        perf.count_write(values.nbytes)
+
+    def _append(self, name, offset, values):
+        path = self.column_path(name)
+        with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+            f.truncate(offset)  # drop a torn tail; rows before `offset` stay untouched
+            f.seek(offset)
+            f.write(values.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        perf.count_write(values.nbytes)
+
+
+class StreamedSetTable:
+    """Per-set table for a history read as a stream, e.g. by core.report().
+
+    add() is given each entry with the storage.history_version up to and
+    including it. Entries are held (packed) until the stream reaches the
+    prefix a SetCache in `cache_dir` covers with a matching version; those
+    columns are then mapped and the held entries dropped, so table() only
+    flattens what came after. Without a matching cache it flattens all of
+    them. Read-only: the cache is left for the app to extend.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache = SetCache(cache_dir) if cache_dir else None
+        self.prefix = self.cache.prefix() if self.cache else None
+        self.count = 0
+        self.cached = None  # (columns, exercises, days) of the covered prefix
+        self.pending = []
+
+    def add(self, entry, version):
+        self.pending.append(packed.pack(entry))
+        self.count += 1
+        if self.prefix == (self.count, version):
+            # Mapped now: a later rebuild renames new files in, these stay valid
+            self.cached = self.cache.load(version)
+            if self.cached is not None:
+                self.pending = []
+
+    def table(self):
+        if self.cached is None:
+            return flatten(self.pending)
+        cols, exercises, days = self.cached
+        if self.pending:
+            exercises, days = list(exercises), list(days)
+            new = flatten_columns(self.pending, exercises, days)
+            cols = {k: np.concatenate([cols[k], new[k]]) for k in SET_COLUMNS}
+        return frame(cols, exercises, days)
+
+
+# =============================================================
+# Incremental engine
+# =============================================================
+
+class AnalyticsEngine:
+    """Per-set table for one history, brought up to date on append.
+
+    update() is given the history tuple and its storage.history_version.
+    With a `cache_dir`, the columns live in a SetCache next to the history:
+    appended sessions are flattened and written once, by whichever process
+    sees them first, and every other load is a memory-map. Without one, the
+    columns are kept in memory and extended when the version chains from the
+    one already indexed (the SharedHistory append path). Anything else
+    (reload, another writer, Clear History) rebuilds. Derived metrics are
+    memoized per version. Safe to share between sessions.
+    """
+
+    def __init__(self, cache_dir=None):
+        self._lock = threading.Lock()
+        self.cache = SetCache(cache_dir) if cache_dir else None
+        self.version = None
+        self.count = 0
+        self.exercises, self.days = [], []
+        self.columns = flatten_columns((), self.exercises, self.days)
+        self.table = frame(self.columns, self.exercises, self.days)
+        self._memo = {}
+
+    def update(self, history, version):
+        with self._lock:
+            if version == self.version:
+                return self.table
+            if self.cache is not None:
+                self.columns, self.exercises, self.days = self.cache.sync(history, version)
+            else:
+                n = self.count
+                if self.version is not None and n <= len(history) and storage.history_version(history[n:], self.version) == version:
+                    new = flatten_columns(history[n:], self.exercises, self.days)
+                    self.columns = {k: np.concatenate([self.columns[k], new[k]]) for k in SET_COLUMNS}
+                else:
+                    self.exercises, self.days = [], []
+                    self.columns = flatten_columns(history, self.exercises, self.days)
+            self.table = frame(self.columns, self.exercises, self.days)
+            self.version, self.count = version, len(history)
+            self._memo = {}
+            return self.table
+
+    def metric(self, name, fn, *args):
+        """fn(table, *args), computed once per history version."""
+        key = (name,) + args
+        with self._lock:
+            if key not in self._memo:
+                self._memo[key] = fn(self.table, *args)
+            return self._memo[key]
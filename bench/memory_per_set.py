@@ -0,0 +1,85 @@
+"""Bytes per logged set: JSON dict entries vs packed.PackedEntry.
+
+Generates a synthetic history (bench/synth_history.py), then measures with
+tracemalloc what stays allocated once the history is held in memory — as
+plain dicts (json.loads of the snapshot) and as packed entries, both packed
+from those dicts and read straight from packed journal rows — plus the
+on-disk size of each format.
+
+    python bench/memory_per_set.py --sessions 1000 5000
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import packed  # noqa: E402
+import synth_history  # noqa: E402
+
+
+def retained(build):
+    """Bytes still allocated by build()'s result after temporaries are freed."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        result = build()
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+def measure(n, seed):
+    entries = list(synth_history.generate(n, seed))
+    sets = sum(len(sets_map) for e in entries for sets_map in e["data"].values())
+    snapshot = json.dumps(entries, indent=2)
+    ndjson = "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in entries)
+    rows = "".join(json.dumps(packed.to_row(e), separators=(",", ":")) + "\n" for e in entries)
+    del entries
+
+    dicts, dict_bytes = retained(lambda: json.loads(snapshot))
+    packed_history, packed_bytes = retained(lambda: tuple(packed.pack(e) for e in json.loads(snapshot)))
+    from_rows, row_bytes = retained(lambda: tuple(packed.from_line(json.loads(line)) for line in rows.splitlines()))
+    assert json.dumps([e.to_json() for e in from_rows]) == json.dumps(dicts)
+    fallback = sum(1 for e in packed_history for v in e.exercises.values() if not isinstance(v, packed.SetLog))
+    return {
+        "sessions": n,
+        "sets": sets,
+        "mem_dict_bytes_per_set": round(dict_bytes / sets, 1),
+        "mem_packed_bytes_per_set": round(packed_bytes / sets, 1),
+        "mem_packed_from_rows_bytes_per_set": round(row_bytes / sets, 1),
+        "disk_snapshot_bytes_per_set": round(len(snapshot.encode()) / sets, 1),
+        "disk_ndjson_bytes_per_set": round(len(ndjson.encode()) / sets, 1),
+        "disk_packed_rows_bytes_per_set": round(len(rows.encode()) / sets, 1),
+        "unpacked_exercises": fallback,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory and disk bytes per set, JSON vs packed")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="also write the results as JSON here")
+    args = parser.parse_args(argv)
+    results = [measure(n, args.seed) for n in args.sessions]
+    for r in results:
+        print(
+            f"{r['sessions']:>6} sessions {r['sets']:>7} sets | memory B/set: dict {r['mem_dict_bytes_per_set']:>6}"
+            f"  packed {r['mem_packed_bytes_per_set']:>6}  (from rows {r['mem_packed_from_rows_bytes_per_set']})"
+            f" | disk B/set: snapshot {r['disk_snapshot_bytes_per_set']}  ndjson {r['disk_ndjson_bytes_per_set']}"
+            f"  packed rows {r['disk_packed_rows_bytes_per_set']}"
+        )
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
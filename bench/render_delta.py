@@ -0,0 +1,114 @@
+"""Per-rerun delta size of the Workout view: "cards" vs "compact" layout.
+
+Drives the app headlessly with Streamlit's AppTest and captures the
+ForwardMsgs each rerun sends to the browser. Per step and layout it records
+the number of delta messages, their serialized protobuf size (what goes over
+the websocket, before compression), and the widget count:
+
+* first_render  Workout view, nothing logged yet
+* idle_rerun    the same view again (e.g. the rest timer ticking a full rerun)
+* log_set       complete set 1 of the first strength exercise
+* idle_after    idle rerun with one set done
+
+    python bench/render_delta.py --sessions 200 --out delta_results.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+APP = os.path.join(ROOT, "workout.py")
+sys.path[:0] = [ROOT, HERE]
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest, local_script_runner  # noqa: E402
+
+import synth_history  # noqa: E402
+
+EXERCISE = "b1_i0"  # first strength exercise of every day
+LAYOUTS = ("cards", "compact")
+
+_captured = []
+_parse = local_script_runner.parse_tree_from_messages
+
+
+def _capturing_parse(messages):
+    # AppTest builds its element tree from exactly the messages of one run
+    _captured.append(list(messages))
+    return _parse(messages)
+
+
+local_script_runner.parse_tree_from_messages = _capturing_parse
+
+
+def log_set(at, layout):
+    if layout == "compact":
+        buttons = [b for b in at.button if EXERCISE in str(b.form_id)]
+    else:
+        buttons = [b for b in at.button if b.key == f"btn_monday_{EXERCISE}_0"]
+    buttons[0].click()
+
+
+def measure(layout):
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    at = AppTest.from_file(APP, default_timeout=600)
+    at.session_state.auto_rest = 0
+    at.session_state.compact_layout = layout == "compact"
+    steps = [
+        ("first_render", lambda: None),
+        ("idle_rerun", lambda: None),
+        ("log_set", lambda: log_set(at, layout)),
+        ("idle_after", lambda: None),
+    ]
+    out = {}
+    for name, action in steps:
+        action()
+        _captured.clear()
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"{layout}/{name}: {at.exception[0].value}")
+        deltas = [m for m in _captured[-1] if m.WhichOneof("type") == "delta"]
+        out[name] = {
+            "delta_msgs": len(deltas),
+            "delta_bytes": sum(m.ByteSize() for m in deltas),
+            "widgets": len(at.button) + len(at.number_input),
+        }
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-rerun delta size, cards vs compact workout layout")
+    parser.add_argument("--sessions", type=int, default=200, help="synthetic history size (for PR badges/prefills)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="also write the results as JSON here")
+    args = parser.parse_args(argv)
+
+    cwd = os.getcwd()
+    results = {}
+    for layout in LAYOUTS:
+        # Fresh data per layout: the sets logged by one run must not carry over
+        with tempfile.TemporaryDirectory() as data_dir:
+            synth_history.write_history(os.path.join(data_dir, "workout_history.json"), args.sessions, args.seed)
+            os.chdir(data_dir)
+            try:
+                results[layout] = measure(layout)
+            finally:
+                os.chdir(cwd)
+    for step in results["cards"]:
+        c, k = results["cards"][step], results["compact"][step]
+        print(
+            f"{step:<13} cards {c['delta_msgs']:>4} msgs {c['delta_bytes']:>7} B {c['widgets']:>3} widgets"
+            f" | compact {k['delta_msgs']:>4} msgs {k['delta_bytes']:>7} B {k['widgets']:>3} widgets"
+            f" | {k['delta_bytes'] / c['delta_bytes']:.0%} of the bytes"
+        )
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"sessions": args.sessions, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Rerun hot-path benchmark against synthetic histories.
+
+For each history size a data directory is seeded with bench/synth_history.py
+output and the app is driven headlessly with Streamlit's AppTest through a
+fixed interaction script (cold start, idle rerun, set click, Analytics,
+History, Finish & Save). Per step it records:
+
+* latency_s       wall time of the rerun
+* bytes_written   write() bytes issued by the process (/proc/self/io)
+* rss_peak_mb     process high-water RSS after the step
+* functions       cumulative seconds in the hot functions, from a second,
+                  cProfile'd pass over the same script (so latency_s is
+                  not inflated by profiling)
+
+    python bench/rerun_bench.py --sizes 100,10000,100000 --out bench_results.json
+"""
+import argparse
+import cProfile
+import json
+import os
+import platform
+import pstats
+import resource
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+APP = os.path.join(ROOT, "workout.py")
+sys.path[:0] = [ROOT, HERE]
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import synth_history  # noqa: E402
+
+# Hot functions reported from the profile pass (defined in workout.py / storage.py)
+FUNCTIONS = (
+    "sync_history",          # shared history lookup / parse
+    "load",                  # store load (JSON parse or SQLite read)
+    "build_exercise_index",  # full last-value + PR rebuild
+    "index_entry",           # per-entry last-value + PR fold
+    "analytics_frames",      # analytics DataFrame build
+    "render_analytics",
+    "render_history",
+    "render_workout",
+    "flush_state",           # workout_data write
+    "save_json",
+)
+
+
+def bytes_written():
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def rss_peak_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def click(at, label):
+    for b in at.button:
+        if b.label == label:
+            return b.click()
+    raise LookupError(f"no button {label!r}")
+
+
+def steps():
+    """(name, action) pairs; each action prepares one rerun of the AppTest."""
+    def view(section):
+        def go(at):
+            at.session_state.section = section
+        return go
+
+    return [
+        ("cold_start", lambda at: None),
+        ("idle_rerun", lambda at: None),
+        ("set_click", lambda at: click(at, "Set 1")),
+        ("analytics_first", view("analytics")),
+        ("analytics_repeat", lambda at: None),
+        ("history_first", view("history")),
+        ("history_next_page", lambda at: click(at, "Older →")),
+        ("workout_back", view("workout")),
+        ("finish_save", lambda at: click(at, "✅ Finish & Save")),
+    ]
+
+
+def fresh_app():
+    # Process-wide caches would otherwise make every "cold" start warm
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    at = AppTest.from_file(APP, default_timeout=3600)
+    at.session_state.auto_rest = 0
+    return at
+
+
+def run_script(data_dir, profile):
+    cwd = os.getcwd()
+    os.chdir(data_dir)
+    try:
+        at = fresh_app()
+        out = {}
+        for name, action in steps():
+            if name != "cold_start":
+                action(at)
+            prof = profile_script_thread() if profile else None
+            w0 = bytes_written()
+            t0 = time.perf_counter()
+            at.run()
+            threading.setprofile(None)
+            elapsed = time.perf_counter() - t0
+            w1 = bytes_written()
+            if at.exception:
+                raise RuntimeError(f"{name}: {at.exception[0].value}")
+            if prof:
+                out[name] = function_times(prof)
+            else:
+                out[name] = {
+                    "latency_s": round(elapsed, 4),
+                    "bytes_written": (w1 - w0) if w0 is not None else None,
+                    "rss_peak_mb": rss_peak_mb(),
+                }
+        return out
+    finally:
+        os.chdir(cwd)
+
+
+def profile_script_thread():
+    """cProfile the next thread started: AppTest executes the script off the main thread."""
+    prof = cProfile.Profile()
+
+    def arm(frame, event, arg):
+        sys.setprofile(None)
+        prof.enable()
+
+    threading.setprofile(arm)
+    return prof
+
+
+def function_times(prof):
+    totals = {}
+    for (filename, _, func), (_, _, _, cumtime, _) in pstats.Stats(prof).stats.items():
+        if func in FUNCTIONS and os.path.dirname(os.path.abspath(filename)) == ROOT:
+            totals[func] = round(totals.get(func, 0.0) + cumtime, 4)
+    return totals
+
+
+def bench_size(n, seed, profile):
+    with tempfile.TemporaryDirectory() as timing_dir, tempfile.TemporaryDirectory() as profile_dir:
+        t0 = time.perf_counter()
+        size = synth_history.write_history(os.path.join(timing_dir, "workout_history.json"), n, seed)
+        generate_s = time.perf_counter() - t0
+        result = {"sessions": n, "history_bytes": size, "generate_s": round(generate_s, 2)}
+        steps_out = run_script(timing_dir, profile=False)
+        if profile:
+            synth_history.write_history(os.path.join(profile_dir, "workout_history.json"), n, seed)
+            for name, funcs in run_script(profile_dir, profile=True).items():
+                steps_out[name]["functions"] = funcs
+        result["steps"] = steps_out
+        return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rerun hot-path benchmark on synthetic histories")
+    parser.add_argument("--sizes", default="100,10000,100000", help="comma-separated session counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-profile", action="store_true", help="skip the cProfile pass")
+    parser.add_argument("--out", default="bench_results.json")
+    args = parser.parse_args(argv)
+
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "streamlit": st.__version__,
+            "platform": platform.platform(),
+            "storage_backend": os.environ.get("WORKOUT_STORAGE", "json"),
+        },
+        "results": [],
+    }
+    for n in (int(x) for x in args.sizes.split(",")):
+        print(f"sessions={n} …", file=sys.stderr)
+        report["results"].append(bench_size(n, args.seed, not args.no_profile))
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    for r in report["results"]:
+        lat = ", ".join(f"{k}={v['latency_s'] * 1000:.0f}ms" for k, v in r["steps"].items())
+        print(f"{r['sessions']:>7} sessions: {lat}", file=sys.stderr)
+    print(f"wrote {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
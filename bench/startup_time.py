@@ -0,0 +1,72 @@
+"""Cold-start timing for the Workout view.
+
+Each sample runs the app once in a fresh interpreter via Streamlit's AppTest
+(so nothing is warm in sys.modules) and records the wall time of the first
+run plus which heavy libraries ended up imported. `--eager` pre-imports
+pandas and plotly first, which reproduces the old top-level imports.
+
+    python bench/startup_time.py            # lazy (current)
+    python bench/startup_time.py --compare  # lazy vs eager side by side
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "workout.py")
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+if {eager}:
+    import pandas, plotly.graph_objects
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=120).run()
+elapsed = time.perf_counter() - t0
+print(json.dumps({{
+    "seconds": elapsed,
+    "pandas": "pandas" in sys.modules,
+    "plotly_go": "plotly.graph_objects" in sys.modules,
+    "exception": bool(at.exception),
+}}))
+"""
+
+
+def sample(eager, runs):
+    out = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as data_dir:
+            proc = subprocess.run(
+                [sys.executable, "-c", CHILD.format(eager=eager, app=APP)],
+                cwd=data_dir, capture_output=True, text=True, check=True,
+            )
+        out.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    secs = [r["seconds"] for r in out]
+    return {
+        "mode": "eager" if eager else "lazy",
+        "runs": runs,
+        "median_s": round(statistics.median(secs), 3),
+        "min_s": round(min(secs), 3),
+        "pandas_imported": any(r["pandas"] for r in out),
+        "plotly_go_imported": any(r["plotly_go"] for r in out),
+        "errors": sum(r["exception"] for r in out),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--eager", action="store_true", help="pre-import pandas/plotly (old behaviour)")
+    parser.add_argument("--compare", action="store_true", help="measure lazy and eager")
+    args = parser.parse_args(argv)
+
+    modes = [False, True] if args.compare else [args.eager]
+    results = [sample(eager, args.runs) for eager in modes]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
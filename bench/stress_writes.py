@@ -0,0 +1,127 @@
+"""Concurrent-writer stress test for the history and state write paths.
+
+Spawns worker processes (each with several threads) that hammer one data
+directory at the same time, then checks that nothing was lost:
+
+* journal   – JSONL appends with a tiny compaction threshold, so background
+              compactions race the appends
+* snapshot  – whole-file history appends (journal mode off)
+* state     – optimistic workout_data.json writes, every writer editing its
+              own slot from a stale revision
+
+    python bench/stress_writes.py --procs 8 --threads 4 --ops 50
+
+Exits non-zero if any entry or slot went missing.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+
+
+def history_worker(data_dir, mode, proc, threads, ops):
+    snapshot = os.path.join(data_dir, "workout_history.json")
+    journal = os.path.join(data_dir, "workout_history.jsonl") if mode == "journal" else None
+    store = storage.JsonHistoryStore(snapshot, journal)
+    compactions = []
+
+    def run(thread):
+        for i in range(ops):
+            store.append({"date": f"p{proc:03d}-t{thread:02d}-{i:05d}", "day": "monday", "data": {}})
+            if journal:
+                t = storage.maybe_compact(snapshot, journal, threshold=4096)
+                if t:
+                    compactions.append(t)
+
+    workers = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    for t in compactions:
+        t.join()
+
+
+def state_worker(data_dir, proc, threads, ops):
+    path = os.path.join(data_dir, "workout_data.json")
+
+    def run(thread):
+        ex_key = f"p{proc}_t{thread}"
+        for i in range(ops):
+            # Every write starts from rev 0, i.e. as stale as it can be
+            doc = {"_schema": 4, "monday": {ex_key: {str(i): {"done": True, "weight": None, "reps": None, "rpe": None}}}}
+            storage.save_versioned(path, doc, 0, {("monday", ex_key, str(i))})
+
+    workers = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+
+def run_mode(mode, procs, threads, ops):
+    with tempfile.TemporaryDirectory() as data_dir:
+        start = time.perf_counter()
+        if mode == "state":
+            jobs = [multiprocessing.Process(target=state_worker, args=(data_dir, p, threads, ops)) for p in range(procs)]
+        else:
+            jobs = [multiprocessing.Process(target=history_worker, args=(data_dir, mode, p, threads, ops)) for p in range(procs)]
+        for j in jobs:
+            j.start()
+        for j in jobs:
+            j.join()
+        elapsed = time.perf_counter() - start
+        failed_workers = sum(1 for j in jobs if j.exitcode != 0)
+
+        expected = procs * threads * ops
+        if mode == "state":
+            doc = storage.read_json(os.path.join(data_dir, "workout_data.json"), {})
+            found = sum(len(sets) for sets in doc.get("monday", {}).values())
+            unique = found
+        else:
+            snapshot = os.path.join(data_dir, "workout_history.json")
+            if mode == "journal":
+                storage.compact_journal(snapshot, os.path.join(data_dir, "workout_history.jsonl"))
+                history = storage.load_with_journal(snapshot, os.path.join(data_dir, "workout_history.jsonl"))
+            else:
+                history = storage.read_json(snapshot, [])
+            found = len(history)
+            unique = len({e["date"] for e in history})
+        return {
+            "mode": mode,
+            "writers": procs * threads,
+            "expected": expected,
+            "found": found,
+            "unique": unique,
+            "lost": expected - unique,
+            "duplicates": found - unique,
+            "worker_failures": failed_workers,
+            "seconds": round(elapsed, 3),
+            "writes_per_sec": round(expected / elapsed, 1),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent-writer stress test")
+    parser.add_argument("--procs", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--ops", type=int, default=50, help="writes per thread")
+    parser.add_argument("--modes", default="journal,snapshot,state")
+    args = parser.parse_args(argv)
+
+    results = [run_mode(m, args.procs, args.threads, args.ops) for m in args.modes.split(",")]
+    print(json.dumps(results, indent=2))
+    ok = all(r["lost"] == 0 and r["duplicates"] == 0 and r["worker_failures"] == 0 for r in results)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Synthetic workout_history.json generator.
+
+Sessions follow the real WORKOUT_TEMPLATES: Mon/Wed/Fri rotation every two
+or three days, every fourth week a deload (one fewer strength/tendon set),
+loads that creep up over time with noise, RPE 6–9, and the occasional
+skipped set or unlogged weight — the same shape Finish & Save writes.
+
+    python bench/synth_history.py 10000 -o /tmp/workout_history.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import SCHEMA_VERSION  # noqa: E402
+from templates import plan_for  # noqa: E402
+
+DAYS = ("monday", "wednesday", "friday")
+# Starting loads (kg) by category; None = bodyweight / not logged
+BASE_LOAD = {"strength": 15.0, "power": 20.0, "tendon": 10.0, "core": None, "accessory": 20.0, "warmup": None, "cooldown": None}
+
+
+def make_session(rng, when, day, n):
+    deload = (n // 12) % 4 == 3  # ~every fourth week of three sessions
+    plan = plan_for(day, deload)
+    data = {}
+    done_total = total = 0
+    for ex_key, cat, sets in zip(plan.keys, plan.cats, plan.sets):
+        base = BASE_LOAD.get(cat)
+        load = None if base is None else round((base + n * 0.01 + rng.uniform(-1.5, 1.5)) * 2) / 2
+        sets_map = {}
+        for s in range(sets):
+            done = rng.random() < 0.92
+            total += 1
+            done_total += done
+            sets_map[str(s)] = {
+                "done": done,
+                "weight": load if (load and rng.random() < 0.85) else None,
+                "reps": None,
+                "rpe": rng.choice((6.0, 6.5, 7.0, 7.5, 8.0, 8.5, 9.0)) if base is not None and rng.random() < 0.7 else None,
+            }
+        data[ex_key] = sets_map
+    return {
+        "date": when.isoformat(),
+        "day": day,
+        "workout_name": plan.title,
+        "completed_sets": done_total,
+        "total_sets": total,
+        "completion_percentage": round(done_total / total * 100, 1) if total else 0,
+        "data": data,
+        "meta": {
+            "schema": SCHEMA_VERSION,
+            "duration_sec": rng.randint(1500, 2100),
+            "name_map": dict(plan.name_map),
+            "deload": deload,
+        },
+    }
+
+
+def generate(n, seed=0, start=datetime(2015, 1, 5, 6, 30)):
+    rng = random.Random(seed)
+    when = start
+    for i in range(n):
+        yield make_session(rng, when + timedelta(microseconds=rng.randint(0, 999999)), DAYS[i % 3], i)
+        when += timedelta(days=rng.choice((2, 2, 3)), minutes=rng.randint(-30, 30))
+
+
+def write_history(path, n, seed=0):
+    """Write n synthetic sessions to `path` in the app's snapshot format; returns bytes written."""
+    with open(path, "w") as f:
+        f.write("[\n")
+        for i, entry in enumerate(generate(n, seed)):
+            f.write((",\n" if i else "") + json.dumps(entry, indent=2))
+        f.write("\n]" if n else "]")
+    return os.path.getsize(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic workout_history.json")
+    parser.add_argument("sessions", type=int)
+    parser.add_argument("-o", "--output", default="workout_history.json")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    size = write_history(args.output, args.sessions, args.seed)
+    print(f"Wrote {args.sessions} sessions ({size / 1e6:.1f} MB) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""Data core of the tracker: exercise index, PRs, weekly totals, progression tips.
+
+Pure functions over history entries (JSON dicts or packed.PackedEntry);
+the app wraps them in its caches. Run as a script it reports on history
+files from the shell, streaming each file and spreading athletes over a
+process pool:
+
+    python core.py report athletes/ --workers 4 --out reports/
+    python core.py report workout_history.json --format json --analytics
+"""
+import heapq
+import json
+import os
+from datetime import datetime
+
+import packed
+import storage
+
+# Progression tips cover these exercises (first word of the name)
+TIP_PREFIXES = ("goblet", "bulgarian", "single‑leg", "hip", "overhead", "calf")
+TIP_SESSIONS = 5  # most recent sessions the tips look at
+TIP_MAX_RPE = 7  # every logged set at or below this -> suggest a load bump
+HISTORY_FILE = "workout_history.json"  # per shard, as the app names it
+SETS_DIR = "workout_sets"  # per-shard analytics.SetCache, when the app has built one
+
+
+# =============================================================
+# Exercise index: last used load/RPE + max-load PR per exercise name
+# =============================================================
+
+def empty_exercise_index():
+    return {"_count": 0, "_last_date": None, "exercises": {}}
+
+
+def index_entry(index, entry):
+    """Fold one history entry (newer than everything indexed) into `index`."""
+    date = entry.get("date")
+    exercises = index["exercises"]
+    for _, ex_name, (weights, rpes) in packed.exercise_columns(entry, ("weight", "rpe")):
+        if not ex_name:
+            continue
+        w_vals = [w for w in weights if w]
+        r_vals = [r for r in rpes if r]
+        if not (w_vals or r_vals):
+            continue
+        rec = exercises.setdefault(ex_name, {"weight": None, "rpe": None, "date": None, "max_load": None, "max_load_date": None})
+        rec["weight"] = w_vals[-1] if w_vals else None
+        rec["rpe"] = r_vals[-1] if r_vals else None
+        rec["date"] = date
+        if w_vals:
+            top = max(float(w) for w in w_vals)
+            if rec["max_load"] is None or top > rec["max_load"]:
+                rec["max_load"] = top
+                rec["max_load_date"] = date
+    index["_count"] += 1
+    index["_last_date"] = date
+    return index
+
+
+def build_exercise_index(history):
+    index = empty_exercise_index()
+    for entry in sorted(history, key=lambda x: x.get("date", "")):
+        index_entry(index, entry)
+    return index
+
+
+def index_matches(index, history, version=None):
+    """Whether `index` was built from `history`; with `version` (storage.history_version),
+    also that no entry has been edited since (the app stamps it as `_version`)."""
+    return (
+        isinstance(index, dict)
+        and index.get("_count") == len(history)
+        and index.get("_last_date") == max((e.get("date", "") for e in history), default=None)
+        and (version is None or index.get("_version") == version)
+    )
+
+
+def pr_rows(exercises):
+    """(exercise, max load, date set) per exercise with a logged load, by name."""
+    return sorted(
+        [(k, v["max_load"], (v["max_load_date"] or "")[:10]) for k, v in exercises.items() if v.get("max_load")],
+        key=lambda x: x[0],
+    )
+
+
+# =============================================================
+# Weekly totals
+# =============================================================
+
+def iso_week(date):
+    """(ISO year, ISO week) of an entry date string, or None if it doesn't parse."""
+    try:
+        return tuple(datetime.fromisoformat(str(date)).isocalendar())[:2]
+    except ValueError:
+        return None
+
+
+def weekly_entry(weekly, entry):
+    """Fold one entry's completed sets into `weekly` {(year, week, day): sets}."""
+    week = iso_week(entry.get("date"))
+    if week is not None:
+        key = week + (entry.get("day"),)
+        weekly[key] = weekly.get(key, 0) + (entry.get("completed_sets") or 0)
+    return weekly
+
+
+def weekly_rows(weekly):
+    """[(year, week, day, completed sets)] in week order."""
+    return [k + (v,) for k, v in sorted(weekly.items(), key=lambda kv: (kv[0][0], kv[0][1], str(kv[0][2])))]
+
+
+# =============================================================
+# Progression tips
+# =============================================================
+
+def recent_sessions(history, n=TIP_SESSIONS):
+    """The `n` newest entries, newest first."""
+    return heapq.nlargest(n, history, key=lambda x: x.get("date") or "")
+
+
+def progression_tips(sessions):
+    """Load-bump suggestions from `sessions` (see recent_sessions())."""
+    tips = []
+    for entry in sessions:
+        for _, ex_name, (rpes,) in packed.exercise_columns(entry, ("rpe",)):
+            if not ex_name:
+                continue
+            rpes = [r for r in rpes if r is not None]
+            if rpes and max(rpes) <= TIP_MAX_RPE and ex_name.lower().split()[0] in TIP_PREFIXES:
+                tips.append(f"Increase load next time on **{ex_name}** by 0.5–2.5kg if form is solid (last session all sets ≤ RPE {TIP_MAX_RPE}).")
+    return tips
+
+
+# =============================================================
+# Reports
+# =============================================================
+
+def report(entries, sink=None):
+    """Everything above in one pass over `entries`, held only as aggregates.
+
+    The index is folded in file order, which is date order for histories the
+    app wrote; use build_exercise_index() for arbitrary order. The history's
+    storage.history_version is folded in the same pass and returned as
+    "version"; `sink(entry, version so far)`, if given, sees every entry too.
+    """
+    index = empty_exercise_index()
+    weekly = {}
+    recent = []  # min-heap of (date, seq, entry): the TIP_SESSIONS newest
+    first = None
+    version = storage.history_version(())
+    for seq, entry in enumerate(storage.current_entries(entries)):
+        version = storage.history_version((entry,), version)
+        if sink is not None:
+            sink(entry, version)
+        date = entry.get("date") or ""
+        first = date if first is None else min(first, date)
+        index_entry(index, entry)
+        weekly_entry(weekly, entry)
+        item = (date, seq, entry)
+        if len(recent) < TIP_SESSIONS:
+            heapq.heappush(recent, item)
+        elif item > recent[0]:
+            heapq.heapreplace(recent, item)
+    sessions = [e for _, _, e in sorted(recent, reverse=True)]
+    return {
+        "sessions": index["_count"],
+        "first_date": first,
+        "last_date": index["_last_date"],
+        "weekly": [dict(zip(("year", "week", "day", "completed_sets"), row)) for row in weekly_rows(weekly)],
+        "prs": [dict(zip(("exercise", "max_load", "date"), row)) for row in pr_rows(index["exercises"])],
+        "tips": progression_tips(sessions),
+        "version": version,
+    }
+
+
+def analytics_report(df):
+    """Best e1RMs and the latest acute:chronic ratio from a per-set table."""
+    import analytics  # pandas: only for --analytics
+
+    e1rm = analytics.e1rm_table(df)
+    acwr = analytics.acute_chronic(df, "tonnage")
+    ratio = acwr["ratio"].iloc[-1] if len(acwr) else float("nan")
+    return {
+        "e1rm": [
+            {"exercise": r.exercise, "e1rm": round(float(r.e1rm), 1), "date": r.date.strftime("%Y-%m-%d")}
+            for r in e1rm.itertuples()
+        ],
+        "acwr": None if ratio != ratio else round(float(ratio), 2),
+    }
+
+
+def athlete_name(history_path):
+    """Shard directory name for <shard>/workout_history.json, else the file's stem."""
+    path = os.path.abspath(history_path)
+    if os.path.basename(path) == HISTORY_FILE:
+        return os.path.basename(os.path.dirname(path))
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def report_file(history_path, with_analytics=False):
+    """Report for one history file (+ its .jsonl journal), streamed from disk.
+
+    A top-level function of plain arguments, so process pools can run it.
+    With `with_analytics`, the per-set table is built from the same pass:
+    mapped from the shard's SetCache for the prefix whose content version
+    it matches, flattened for the rest.
+    """
+    journal = os.path.splitext(history_path)[0] + ".jsonl"
+    out = {"athlete": athlete_name(history_path), "path": history_path}
+    sets = None
+    if with_analytics:
+        import analytics
+
+        sets = analytics.StreamedSetTable(os.path.join(os.path.dirname(history_path), SETS_DIR))
+    out.update(report(storage.iter_history(history_path, journal), sets and sets.add))
+    if sets is not None:
+        out.update(analytics_report(sets.table()))
+    return out
+
+
+def format_report(rep, weeks=8):
+    """Plain-text rendering of report_file()'s result (last `weeks` weeks)."""
+    lines = [f"== {rep['athlete']} ==", f"{rep['sessions']} session(s), {(rep['first_date'] or '-')[:10]} – {(rep['last_date'] or '-')[:10]}"]
+    recent = sorted({(w["year"], w["week"]) for w in rep["weekly"]})[-weeks:]
+    if recent:
+        lines.append("Weekly completed sets:")
+        for year, week in recent:
+            days = ", ".join(f"{w['day']} {w['completed_sets']}" for w in rep["weekly"] if (w["year"], w["week"]) == (year, week))
+            lines.append(f"  {year}-W{week:02d}: {days}")
+    if rep["prs"]:
+        lines.append("Personal records (by load):")
+        lines.extend(f"  {p['exercise']}: {p['max_load']:g} kg ({p['date']})" for p in rep["prs"])
+    if "e1rm" in rep:
+        lines.append("Estimated 1RM:")
+        lines.extend(f"  {r['exercise']}: {r['e1rm']:g} kg ({r['date']})" for r in rep["e1rm"])
+        lines.append(f"Acute:chronic (tonnage): {rep['acwr'] if rep['acwr'] is not None else 'n/a (< 4 weeks)'}")
+    if rep["tips"]:
+        lines.append("Progression tips:")
+        lines.extend("  • " + t.replace("**", "") for t in rep["tips"])
+    return "\n".join(lines)
+
+
+def history_files(paths):
+    """Expand files, shard directories and athletes/ directories into history files."""
+    found = []
+    for path in paths:
+        if not os.path.isdir(path):
+            found.append(path)
+        elif os.path.exists(os.path.join(path, HISTORY_FILE)):
+            found.append(os.path.join(path, HISTORY_FILE))
+        else:
+            for name in sorted(os.listdir(path)):
+                candidate = os.path.join(path, name, HISTORY_FILE)
+                if os.path.exists(candidate):
+                    found.append(candidate)
+    return found
+
+
+def main(argv=None):
+    import argparse
+    import functools
+    from concurrent.futures import ProcessPoolExecutor
+
+    parser = argparse.ArgumentParser(description="Workout history reports, without the app")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    rep = sub.add_parser("report", help="Weekly totals, PRs and progression tips per athlete")
+    rep.add_argument("paths", nargs="+", help="workout_history.json files, shard directories, or an athletes/ directory")
+    rep.add_argument("--format", choices=("text", "json"), default="text")
+    rep.add_argument("--out", help="write one <athlete>.txt/.json per athlete here instead of printing")
+    rep.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes (1 = run in this process)")
+    rep.add_argument("--weeks", type=int, default=8, help="weeks of weekly totals in text output")
+    rep.add_argument("--analytics", action="store_true", help="add e1RMs and acute:chronic load (needs pandas)")
+    args = parser.parse_args(argv)
+
+    missing = [p for p in args.paths if not os.path.exists(p)]
+    if missing:
+        parser.error("not found: " + ", ".join(missing))
+    files = history_files(args.paths)
+    if not files:
+        parser.error("no history files found")
+    run = functools.partial(report_file, with_analytics=args.analytics)
+    workers = max(1, min(args.workers, len(files)))
+    if workers == 1:
+        results = map(run, files)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(workers)
+        results = pool.map(run, files)
+    try:
+        if args.out:
+            os.makedirs(args.out, exist_ok=True)
+        reports = []
+        for result in results:
+            text = json.dumps(result, indent=2) if args.format == "json" else format_report(result, args.weeks)
+            if args.out:
+                path = os.path.join(args.out, f"{result['athlete']}.{'json' if args.format == 'json' else 'txt'}")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(text + "\n")
+                print(f"{result['athlete']}: {result['sessions']} session(s) -> {path}")
+            elif args.format == "json":
+                reports.append(result)
+            else:
+                print(text + "\n")
+        if reports:
+            print(json.dumps(reports, indent=2))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
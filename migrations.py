@@ -0,0 +1,95 @@
+"""Schema migrations for workout_data and history entries.
+
+Everything older is brought to the v4 shape once, when it is loaded, so the
+rest of the app can rely on it: three training days, every set slot a
+{"done", "weight", "reps", "rpe"} dict under a string index, and every
+history entry carrying the summary fields plus meta.schema/name_map/deload.
+The version stamp is `_schema` on workout_data and `meta.schema` on history
+entries; anything already stamped current is returned untouched.
+"""
+from templates import WORKOUT_TEMPLATES
+
+SCHEMA_VERSION = 4  # v4: 3-day split, time caps, progression tips, deload toggle
+DAYS = ("monday", "wednesday", "friday")
+ENTRY_FIELDS = ("date", "day", "workout_name", "completed_sets", "total_sets", "completion_percentage", "data", "meta")
+
+
+def empty_state():
+    return {"_schema": SCHEMA_VERSION, "monday": {}, "wednesday": {}, "friday": {}}
+
+
+def migrate_slot(val):
+    if isinstance(val, dict):
+        return {
+            "done": bool(val.get("done")),
+            "weight": val.get("weight"),
+            "reps": val.get("reps"),
+            "rpe": val.get("rpe"),
+        }
+    # v1-v2 stored a bare done flag per set
+    return {"done": bool(val), "weight": None, "reps": None, "rpe": None}
+
+
+def migrate_day(day_data):
+    """{ex_key: {set index: slot}} with every slot in the v4 shape."""
+    if not isinstance(day_data, dict):
+        return {}
+    return {
+        ex_key: {str(idx): migrate_slot(val) for idx, val in sets_map.items()}
+        for ex_key, sets_map in day_data.items()
+        if isinstance(sets_map, dict)
+    }
+
+
+def migrate_state(data):
+    """workout_data at the current schema (the same object if it already is)."""
+    if isinstance(data, dict) and data.get("_schema") == SCHEMA_VERSION:
+        return data
+    migrated = empty_state()
+    for day in DAYS:
+        migrated[day] = migrate_day((data or {}).get(day, {}) if isinstance(data, dict) else {})
+    if isinstance(data, dict) and "_rev" in data:
+        migrated["_rev"] = data["_rev"]  # keeps optimistic saves merging against the file
+    return migrated
+
+
+def entry_is_current(entry):
+    meta = entry.get("meta")
+    return isinstance(meta, dict) and meta.get("schema") == SCHEMA_VERSION
+
+
+def migrate_entry(entry):
+    """A history entry at the current schema (the same object if it already is).
+
+    Missing counts are recomputed from the sets; a missing name_map stays
+    empty rather than being guessed from today's templates, whose exercise
+    keys may not match what was trained back then.
+    """
+    if entry_is_current(entry):
+        return entry
+    data = migrate_day(entry.get("data"))
+    slots = [slot for sets_map in data.values() for slot in sets_map.values()]
+    done = sum(slot["done"] for slot in slots)
+    day = entry.get("day") if isinstance(entry.get("day"), str) else ""
+    template = WORKOUT_TEMPLATES.get(day)
+    meta = dict(entry["meta"]) if isinstance(entry.get("meta"), dict) else {}
+    meta["schema"] = SCHEMA_VERSION
+    if not isinstance(meta.get("name_map"), dict):
+        meta["name_map"] = {}
+    meta["deload"] = bool(meta.get("deload"))
+    total = entry.get("total_sets", len(slots))
+    completed = entry.get("completed_sets", done)
+    migrated = {
+        "date": entry.get("date"),
+        "day": day,
+        "workout_name": entry.get("workout_name") or (template["title"] if template else day.title()),
+        "completed_sets": completed,
+        "total_sets": total,
+        "completion_percentage": entry.get(
+            "completion_percentage", round(completed / total * 100, 1) if total else 0
+        ),
+        "data": data,
+        "meta": meta,
+    }
+    migrated.update((k, v) for k, v in entry.items() if k not in ENTRY_FIELDS)
+    return migrated
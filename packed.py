@@ -0,0 +1,313 @@
+"""Compact history entries: packed per-exercise set arrays, interned names.
+
+In its JSON form every history entry repeats a four-key dict per set under
+string indexes, plus the session's full exercise name_map. PackedEntry keeps
+each exercise's sets in one SetLog (two bitmasks and a float array) and
+points at the compiled template plan instead of carrying a name_map whenever
+the two agree. to_json() rebuilds the JSON shape, so snapshots and exports
+stay readable; to_row()/from_row() are the compact JSONL form used by the
+history journal.
+"""
+import math
+import sys
+from array import array
+
+from templates import PLANS
+
+FIELDS = ("weight", "reps", "rpe")
+SLOT_KEYS = ("done",) + FIELDS  # key order as written by the app
+ENTRY_FIELDS = ("date", "day", "workout_name", "completed_sets", "total_sets", "completion_percentage")
+ROW_VERSION = 1
+
+_MISSING = object()  # field absent from the source entry (omitted again by to_json)
+
+
+def _is_value(v):
+    # Floats only: ints would come back as floats and change the JSON
+    return v is None or (type(v) is float and not math.isnan(v))
+
+
+class SetLog:
+    """Sets of one exercise: `present`/`done` bitmasks over set indexes and
+    one float64 array holding weight, reps, rpe per index (NaN = None)."""
+
+    __slots__ = ("present", "done", "values")
+
+    def __init__(self, present, done, values):
+        self.present = present
+        self.done = done
+        self.values = values
+
+    @classmethod
+    def pack(cls, sets_map):
+        """SetLog for a JSON sets map, or None if it holds anything that wouldn't round-trip."""
+        if not isinstance(sets_map, dict):
+            return None
+        slots = {}
+        last = -1
+        for idx, slot in sets_map.items():
+            # Ascending canonical indexes only, so to_json() reproduces the key order
+            if not (isinstance(idx, str) and idx.isdigit() and str(int(idx)) == idx) or int(idx) <= last:
+                return None
+            last = int(idx)
+            if not isinstance(slot, dict) or tuple(slot) != SLOT_KEYS or type(slot["done"]) is not bool:
+                return None
+            if not all(_is_value(slot[f]) for f in FIELDS):
+                return None
+            slots[int(idx)] = slot
+        n = max(slots) + 1 if slots else 0
+        values = array("d", [math.nan]) * (3 * n)
+        present = done = 0
+        for i, slot in slots.items():
+            present |= 1 << i
+            if slot["done"]:
+                done |= 1 << i
+            for j, f in enumerate(FIELDS):
+                if slot[f] is not None:
+                    values[3 * i + j] = slot[f]
+        return cls(present, done, values)
+
+    def indexes(self):
+        return [i for i in range(len(self.values) // 3) if self.present >> i & 1]
+
+    def value(self, i, field):
+        v = self.values[3 * i + FIELDS.index(field)]
+        return None if math.isnan(v) else v
+
+    def column(self, field):
+        """Values of `field` for the present sets, in index order."""
+        return [self.value(i, field) for i in self.indexes()]
+
+    def to_json(self):
+        return {
+            str(i): {
+                "done": bool(self.done >> i & 1),
+                "weight": self.value(i, "weight"),
+                "reps": self.value(i, "reps"),
+                "rpe": self.value(i, "rpe"),
+            }
+            for i in self.indexes()
+        }
+
+    def to_row(self):
+        return [self.present, self.done, [None if math.isnan(v) else v for v in self.values]]
+
+    @classmethod
+    def from_row(cls, row):
+        present, done, values = row
+        return cls(present, done, array("d", (math.nan if v is None else v for v in values)))
+
+
+class PackedEntry:
+    """One history entry in packed form.
+
+    `exercises` maps interned ex_keys to a SetLog, or to the original sets
+    map when it can't be packed losslessly (older schemas). The name_map is
+    `plan.name_map` when it matches the compiled template, else an interned
+    copy in `names`. get()/[] mirror the JSON entry for existing readers;
+    "data" and "meta" are rebuilt on each access, so hot paths should use
+    exercise_columns() instead.
+    """
+
+    __slots__ = ENTRY_FIELDS + ("meta", "plan", "names", "exercises", "extra")
+
+    @classmethod
+    def pack(cls, entry):
+        self = cls()
+        for f in ENTRY_FIELDS:
+            setattr(self, f, entry.get(f, _MISSING))
+        self.extra = {k: v for k, v in entry.items() if k not in ENTRY_FIELDS and k not in ("data", "meta")} or None
+        meta = entry.get("meta", _MISSING)
+        self.plan = self.names = None
+        if isinstance(meta, dict) and isinstance(meta.get("name_map"), dict):
+            name_map = meta["name_map"]
+            plan = PLANS.get((entry.get("day"), bool(meta.get("deload"))))
+            if plan is not None and name_map == plan.name_map:
+                self.plan = plan
+            else:
+                self.names = {sys.intern(str(k)): sys.intern(str(v)) if isinstance(v, str) else v for k, v in name_map.items()}
+            meta = dict(meta, name_map=None)  # keeps the key's position for to_json()
+        self.meta = meta
+        data = entry.get("data", _MISSING)
+        if isinstance(data, dict):
+            self.exercises = {}
+            for ex_key, sets_map in data.items():
+                log = SetLog.pack(sets_map)
+                self.exercises[sys.intern(ex_key) if isinstance(ex_key, str) else ex_key] = log if log is not None else sets_map
+        else:
+            self.exercises = data
+        return self
+
+    @property
+    def name_map(self):
+        if self.plan is not None:
+            return self.plan.name_map
+        return self.names or {}
+
+    def _meta_json(self):
+        if self.plan is None and self.names is None:
+            return self.meta
+        name_map = dict(self.name_map)
+        return {k: (name_map if k == "name_map" else v) for k, v in self.meta.items()}
+
+    def _data_json(self):
+        if not isinstance(self.exercises, dict):
+            return self.exercises
+        return {k: (v.to_json() if isinstance(v, SetLog) else v) for k, v in self.exercises.items()}
+
+    def to_json(self):
+        out = {f: getattr(self, f) for f in ENTRY_FIELDS if getattr(self, f) is not _MISSING}
+        if self.exercises is not _MISSING:
+            out["data"] = self._data_json()
+        if self.meta is not _MISSING:
+            out["meta"] = self._meta_json()
+        if self.extra:
+            out.update(self.extra)
+        return out
+
+    def get(self, key, default=None):
+        if key in ENTRY_FIELDS:
+            value = getattr(self, key)
+        elif key == "data":
+            value = self._data_json()
+        elif key == "meta":
+            value = self._meta_json()
+        else:
+            value = (self.extra or {}).get(key, _MISSING)
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def fingerprint(self):
+        """Bytes that differ whenever the entry's content does; cheaper than to_json()."""
+        head = [(f, getattr(self, f)) for f in ENTRY_FIELDS if getattr(self, f) is not _MISSING]
+        meta = None if self.meta is _MISSING else self.meta
+        tpl = (self.plan.day, self.plan.deload) if self.plan is not None else None
+        parts = [repr((head, meta, tpl, self.names, self.extra)).encode()]
+        if isinstance(self.exercises, dict):
+            for k, v in self.exercises.items():
+                if isinstance(v, SetLog):
+                    parts.append(repr((k, v.present, v.done)).encode())
+                    parts.append(v.values.tobytes())
+                else:
+                    parts.append(repr((k, v)).encode())
+        elif self.exercises is not _MISSING:
+            parts.append(repr(self.exercises).encode())
+        return b"\x1f".join(parts)
+
+    # ---- compact JSONL row ----
+
+    def to_row(self):
+        row = {"p": ROW_VERSION}
+        row.update((f, getattr(self, f)) for f in ENTRY_FIELDS if getattr(self, f) is not _MISSING)
+        if self.meta is not _MISSING:
+            row["meta"] = self.meta
+        if self.plan is not None:
+            row["tpl"] = [self.plan.day, self.plan.deload]
+        elif self.names is not None:
+            row["names"] = self.names
+        if isinstance(self.exercises, dict):
+            row["x"] = {k: (v.to_row() if isinstance(v, SetLog) else {"raw": v}) for k, v in self.exercises.items()}
+        elif self.exercises is not _MISSING:
+            row["x_raw"] = self.exercises
+        if self.extra:
+            row["extra"] = self.extra
+        return row
+
+    @classmethod
+    def from_row(cls, row):
+        self = cls()
+        for f in ENTRY_FIELDS:
+            setattr(self, f, row.get(f, _MISSING))
+        self.meta = row.get("meta", _MISSING)
+        self.plan = PLANS.get(tuple(row["tpl"])) if "tpl" in row else None
+        names = row.get("names")
+        self.names = {sys.intern(k): sys.intern(v) if isinstance(v, str) else v for k, v in names.items()} if names is not None else None
+        if "x" in row:
+            self.exercises = {
+                sys.intern(k): (v["raw"] if isinstance(v, dict) else SetLog.from_row(v)) for k, v in row["x"].items()
+            }
+        else:
+            self.exercises = row.get("x_raw", _MISSING)
+        self.extra = row.get("extra")
+        return self
+
+
+# =============================================================
+# Converters + readers that work on either form
+# =============================================================
+
+def pack(entry):
+    return entry if isinstance(entry, PackedEntry) else PackedEntry.pack(entry)
+
+
+def unpack(entry):
+    """Plain JSON dict for `entry` (JSON dicts pass through untouched)."""
+    return entry.to_json() if isinstance(entry, PackedEntry) else entry
+
+
+def to_row(entry):
+    return pack(entry).to_row()
+
+
+def fingerprint(entry):
+    return pack(entry).fingerprint()
+
+
+def from_line(obj):
+    """Journal line payload: a packed row becomes a PackedEntry, a plain entry stays a dict."""
+    return PackedEntry.from_row(obj) if isinstance(obj, dict) and obj.get("p") == ROW_VERSION else obj
+
+
+def exercise_columns(entry, fields=("weight", "rpe")):
+    """Yield (ex_key, ex_name, [values of each field per set]) for a JSON or packed entry."""
+    if isinstance(entry, PackedEntry):
+        name_map = entry.name_map
+        items = entry.exercises.items() if isinstance(entry.exercises, dict) else ()
+    else:
+        name_map = (entry.get("meta") or {}).get("name_map") or {}
+        items = (entry.get("data") or {}).items()
+    for ex_key, sets in items:
+        if isinstance(sets, SetLog):
+            columns = [sets.column(f) for f in fields]
+        else:
+            slots = [v for v in sets.values() if isinstance(v, dict)] if isinstance(sets, dict) else []
+            columns = [[v.get(f) for v in slots] for f in fields]
+        yield ex_key, name_map.get(ex_key), columns
+
+
+def set_rows(entry):
+    """Yield (ex_key, ex_name, set index, done, weight, reps, rpe) per set of a JSON or packed entry."""
+    if isinstance(entry, PackedEntry):
+        name_map = entry.name_map
+        items = entry.exercises.items() if isinstance(entry.exercises, dict) else ()
+    else:
+        name_map = (entry.get("meta") or {}).get("name_map") or {}
+        items = (entry.get("data") or {}).items()
+    for ex_key, sets in items:
+        name = name_map.get(ex_key)
+        if isinstance(sets, SetLog):
+            for i in sets.indexes():
+                yield ex_key, name, i, bool(sets.done >> i & 1), sets.value(i, "weight"), sets.value(i, "reps"), sets.value(i, "rpe")
+        elif isinstance(sets, dict):
+            for pos, (idx, slot) in enumerate(sets.items()):
+                if isinstance(slot, dict):
+                    i = int(idx) if str(idx).isdigit() else pos
+                    yield ex_key, name, i, bool(slot.get("done")), slot.get("weight"), slot.get("reps"), slot.get("rpe")
+
+
+def summary(entry):
+    """Top-level scalars of an entry (no per-set data), e.g. for a DataFrame row."""
+    meta = entry.meta if isinstance(entry, PackedEntry) else entry.get("meta")
+    meta = meta if isinstance(meta, dict) else {}
+    row = {f: entry.get(f) for f in ENTRY_FIELDS}
+    row["deload"] = meta.get("deload")
+    row["duration_sec"] = meta.get("duration_sec")
+    return row
@@ -0,0 +1,89 @@
+"""Per-rerun timing spans and write counters.
+
+A trace is thread-local: Streamlit runs each session's rerun on its own
+script thread, so concurrent sessions never mix their numbers, and work on
+background threads (journal compaction, deferred downloads) is simply not
+attributed to any rerun. Without an active trace every helper is a no-op.
+"""
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+class Trace:
+    def __init__(self, label=""):
+        self.label = label
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.total_ms = None
+        self.spans = {}  # name -> [calls, ms]
+        self.writes = 0
+        self.bytes_written = 0
+
+    def add(self, name, ms):
+        slot = self.spans.setdefault(name, [0, 0.0])
+        slot[0] += 1
+        slot[1] += ms
+
+    def finish(self):
+        self.total_ms = (time.perf_counter() - self._t0) * 1000
+        return self
+
+    def as_dict(self):
+        return {
+            "ts": self.started,
+            "label": self.label,
+            "total_ms": round(self.total_ms or 0.0, 2),
+            "writes": self.writes,
+            "bytes_written": self.bytes_written,
+            "spans": {k: {"calls": c, "ms": round(ms, 2)} for k, (c, ms) in self.spans.items()},
+        }
+
+
+def begin(label=""):
+    _local.trace = Trace(label)
+    return _local.trace
+
+
+def end():
+    trace = getattr(_local, "trace", None)
+    _local.trace = None
+    return trace.finish() if trace else None
+
+
+def current():
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def span(name):
+    trace = current()
+    if trace is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, (time.perf_counter() - t0) * 1000)
+
+
+def timed(name):
+    """Decorator form of span(); put it under cache decorators to time misses only."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def count_write(nbytes):
+    trace = current()
+    if trace is not None:
+        trace.writes += 1
+        trace.bytes_written += nbytes
@@ -0,0 +1,804 @@
+"""File-level persistence helpers shared by the Streamlit app.
+
+Kept free of Streamlit imports so the data files can be inspected or
+repaired from plain Python scripts.
+"""
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import migrations
+import packed
+import perf
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+JOURNAL_COMPACT_BYTES = 256 * 1024  # fold the journal into the snapshot past this size
+
+# Module objects survive Streamlit reruns (the module is imported once per
+# process), so this lock is shared by every session in the server.
+_compact_lock = threading.Lock()
+# Fallback when flock isn't available: serialises threads of this process only
+_thread_locks = defaultdict(threading.Lock)
+
+# =============================================================
+# Locking + atomic writes
+# =============================================================
+
+@contextmanager
+def file_lock(path, shared=False):
+    """Advisory lock on `path + ".lock"`, held across threads and processes.
+
+    flock locks belong to the open file, so each holder opens its own handle
+    and threads of one server block each other just like separate workers.
+    """
+    if fcntl is None:
+        with _thread_locks[os.path.abspath(path)]:
+            yield
+        return
+    with open(path + ".lock", "a") as fh:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def read_json(path, fallback):
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except Exception:
+            return fallback
+    return fallback
+
+
+_NUMBER_CHARS = frozenset("0123456789.eE+-")
+
+
+def iter_json_array(path, chunk_size=1 << 16):
+    """Yield the elements of a top-level JSON array file without loading it whole."""
+    decoder = json.JSONDecoder()
+    with open(path, "r") as f:
+        buf, pos = "", 0
+
+        def more():
+            nonlocal buf, pos
+            chunk = f.read(chunk_size)
+            if chunk:
+                buf, pos = buf[pos:] + chunk, 0
+            return bool(chunk)
+
+        def peek():
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos].isspace():
+                    pos += 1
+                if pos < len(buf):
+                    return buf[pos]
+                if not more():
+                    return ""
+
+        if peek() != "[":
+            raise ValueError(f"{path}: not a JSON array")
+        pos += 1
+        if peek() == "]":
+            return
+        while True:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if more():
+                    continue  # element runs past this chunk
+                raise
+            if (end == len(buf) or (type(item) in (int, float) and buf[end] in _NUMBER_CHARS)) and more():
+                # A bare number cut by the chunk boundary decodes as its prefix
+                # ("2" of "2.5", "1" of "1e3"): read on until it's followed by
+                # something that can't continue it
+                continue
+            pos = end
+            yield item
+            sep = peek()
+            if sep == "]":
+                return
+            if sep != ",":
+                raise ValueError(f"{path}: expected ',' or ']' at element boundary")
+            pos += 1
+            peek()
+
+
+def write_json(path, data, indent=2):
+    """Write via a unique temp file + fsync + rename; readers never see a partial file."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+            perf.count_write(f.tell())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def copy_path(src, dst, path):
+    """Copy the value at key `path` (a tuple) from src to dst; delete it if src lacks it."""
+    *parents, last = path
+    for key in parents:
+        src = src.get(key) if isinstance(src, dict) else None
+        dst = dst.setdefault(key, {})
+    if isinstance(src, dict) and last in src:
+        dst[last] = src[last]
+    else:
+        dst.pop(last, None)
+
+
+def save_versioned(path, data, base_rev, changed_paths=None, indent=2):
+    """Optimistic write of a dict document carrying a `_rev` counter.
+
+    If the file is still at `base_rev` (nobody wrote since we loaded it),
+    `data` is written as is. Otherwise only `changed_paths` are replayed on
+    top of the newer file, so concurrent edits to different slots merge
+    instead of the last writer winning. `None` means the whole document.
+    Returns the document that was written.
+    """
+    with file_lock(path):
+        disk = read_json(path, None)
+        disk_rev = disk.get("_rev", 0) if isinstance(disk, dict) else 0
+        if not isinstance(disk, dict) or disk_rev == base_rev or changed_paths is None:
+            merged = dict(data)
+        else:
+            merged = disk
+            for p in changed_paths:
+                copy_path(data, merged, p)
+        merged["_rev"] = disk_rev + 1
+        write_json(path, merged, indent=indent)
+        return merged
+
+
+# =============================================================
+# JSON snapshot + JSONL journal files
+# =============================================================
+
+def compacting_path(journal_path):
+    return journal_path + ".compacting"
+
+
+def read_journal(path):
+    """Yield entries from a JSONL journal, ignoring a torn final line.
+
+    Packed rows (see packed.to_row) come back as PackedEntry, older plain
+    lines as dicts.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                # Partial line from a crash mid-append; everything before it is intact
+                continue
+            yield packed.from_line(obj)
+
+
+def _write_journal_line(path, entry):
+    # Caller holds file_lock(path)
+    line = (json.dumps(packed.to_row(entry), separators=(",", ":")) + "\n").encode("utf-8")
+    with open(path, "a+b") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                # Terminate a torn line so it can't swallow this entry
+                line = b"\n" + line
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+    perf.count_write(len(line))
+
+
+def _merge_into_snapshot(path, entry):
+    # Caller holds file_lock(path)
+    history = read_json(path, [])
+    if not isinstance(history, list):
+        history = []
+    if all(e.get("date") != entry.get("date") for e in history if isinstance(e, dict)):
+        history.append(packed.unpack(entry))
+    write_json(path, history)
+    return history
+
+
+def file_signature(*paths):
+    """(mtime_ns, size) per path, None for missing files — changes on any write."""
+    out = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            out.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            out.append(None)
+    return tuple(out)
+
+
+def load_with_journal(snapshot_path, journal_path):
+    """Replay the snapshot, then any in-flight compaction, then the journal."""
+    # Shared lock: a compaction swaps snapshot and .compacting under the exclusive one
+    with file_lock(snapshot_path, shared=True):
+        history = read_json(snapshot_path, [])
+        if not isinstance(history, list):
+            history = []
+        pending = compacting_path(journal_path)
+        if os.path.exists(pending):
+            # A crash after the snapshot was replaced can leave these already folded in
+            seen = {e.get("date") for e in history if isinstance(e, dict)}
+            history.extend(e for e in read_journal(pending) if e.get("date") not in seen)
+        with file_lock(journal_path, shared=True):
+            history.extend(read_journal(journal_path))
+    return history
+
+
+def iter_history(snapshot_path, journal_path=None, strict=False):
+    """Stream the same entries load_with_journal() returns, one at a time.
+
+    For batch jobs over large files: the snapshot is parsed incrementally
+    and no lock is held (the snapshot is only ever replaced by rename, and
+    torn journal lines are skipped), so the app's writers never wait on it.
+    With `strict`, an unreadable snapshot raises ValueError instead of
+    ending the snapshot part of the stream.
+    """
+    seen = None
+    pending = compacting_path(journal_path) if journal_path else None
+    if pending and os.path.exists(pending):
+        seen = set()
+    if os.path.exists(snapshot_path):
+        try:
+            for entry in iter_json_array(snapshot_path):
+                if isinstance(entry, dict):
+                    if seen is not None:
+                        seen.add(entry.get("date"))
+                    yield entry
+        except ValueError:
+            if strict:
+                raise
+            # same as read_json(): an unreadable snapshot counts as empty
+    if seen is not None:
+        yield from (e for e in read_journal(pending) if e.get("date") not in seen)
+    if journal_path:
+        yield from read_journal(journal_path)
+
+
+def compact_journal(snapshot_path, journal_path):
+    """Fold the journal into the snapshot. Appends keep working while this runs."""
+    if not _compact_lock.acquire(blocking=False):
+        return  # another compaction is already running in this process
+    try:
+        # One compaction at a time across processes; appends only wait for the rename
+        with file_lock(snapshot_path):
+            pending = compacting_path(journal_path)
+            with file_lock(journal_path):
+                if not os.path.exists(pending):
+                    if not os.path.exists(journal_path):
+                        return
+                    # New appends go to a fresh journal from here on
+                    os.replace(journal_path, pending)
+            snapshot = read_json(snapshot_path, [])
+            if not isinstance(snapshot, list):
+                snapshot = []
+            seen = {e.get("date") for e in snapshot if isinstance(e, dict)}
+            # The snapshot stays plain JSON; only the journal holds packed rows
+            snapshot.extend(packed.unpack(e) for e in read_journal(pending) if e.get("date") not in seen)
+            write_json(snapshot_path, snapshot)
+            os.remove(pending)
+    finally:
+        _compact_lock.release()
+
+
+def maybe_compact(snapshot_path, journal_path, threshold=JOURNAL_COMPACT_BYTES):
+    """Start a background compaction once the journal grows past `threshold` bytes."""
+    try:
+        size = os.path.getsize(journal_path)
+    except OSError:
+        return None
+    if size < threshold:
+        return None
+    t = threading.Thread(target=compact_journal, args=(snapshot_path, journal_path), daemon=True)
+    t.start()
+    return t
+
+
+def reset_journal(snapshot_path, journal_path, data=None):
+    """Replace the snapshot and drop any journal (used by Clear History)."""
+    with _compact_lock, file_lock(snapshot_path), file_lock(journal_path):
+        for p in (journal_path, compacting_path(journal_path)):
+            if os.path.exists(p):
+                os.remove(p)
+        write_json(snapshot_path, data if data is not None else [])
+
+
+# =============================================================
+# Export — records streamed into a binary file object
+# =============================================================
+
+EXPORT_FORMATS = {
+    # key: (file name, mime type)
+    "json": ("workout_history.json", "application/json"),
+    "ndjson": ("workout_history.ndjson", "application/x-ndjson"),
+    "json.gz": ("workout_history.json.gz", "application/gzip"),
+    "ndjson.gz": ("workout_history.ndjson.gz", "application/gzip"),
+}
+
+
+def iter_export(history, fmt):
+    """Yield text chunks, one record at a time, for "json" (pretty) or "ndjson"."""
+    if fmt == "ndjson":
+        for entry in history:
+            yield json.dumps(packed.unpack(entry), separators=(",", ":")) + "\n"
+        return
+    # Same bytes as json.dumps(history, indent=2), without building one string;
+    # `history` may be any iterable
+    first = True
+    for entry in history:
+        body = json.dumps(packed.unpack(entry), indent=2).replace("\n", "\n  ")
+        yield ("[\n  " if first else ",\n  ") + body
+        first = False
+    yield "[]" if first else "\n]"
+
+
+def export_history(history, fmt, out):
+    """Write `history` to binary file object `out` in one of EXPORT_FORMATS."""
+    base, _, compression = fmt.partition(".")
+    if compression == "gz":
+        with gzip.GzipFile(fileobj=out, mode="wb", mtime=0) as gz:
+            for chunk in iter_export(history, base):
+                gz.write(chunk.encode("utf-8"))
+    else:
+        for chunk in iter_export(history, base):
+            out.write(chunk.encode("utf-8"))
+    return out
+
+
+# =============================================================
+# Pluggable history stores — JSON snapshot+journal or SQLite
+# =============================================================
+
+class JsonHistoryStore:
+    """History as workout_history.json, optionally with a JSONL append journal."""
+
+    def __init__(self, snapshot_path, journal_path=None):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+
+    def load(self):
+        if self.journal_path:
+            return load_with_journal(self.snapshot_path, self.journal_path)
+        data = read_json(self.snapshot_path, [])
+        return data if isinstance(data, list) else []
+
+    @property
+    def key(self):
+        return ("json", os.path.abspath(self.snapshot_path), self.journal_path and os.path.abspath(self.journal_path))
+
+    def signature(self):
+        if self.journal_path:
+            return file_signature(self.snapshot_path, self.journal_path, compacting_path(self.journal_path))
+        return file_signature(self.snapshot_path)
+
+    def append(self, entry):
+        """Append `entry`. Returns the store signature just before and after the write.
+
+        Both are taken under the same lock as the write, so a caller whose
+        cached copy matches `before` knows `entry` is the only change.
+        """
+        lock_path = self.journal_path or self.snapshot_path
+        with file_lock(lock_path):
+            before = self.signature()
+            if self.journal_path:
+                _write_journal_line(self.journal_path, entry)
+            else:
+                _merge_into_snapshot(self.snapshot_path, entry)
+            after = self.signature()
+        if self.journal_path:
+            maybe_compact(self.snapshot_path, self.journal_path)
+        return before, after
+
+    def clear(self):
+        if self.journal_path:
+            reset_journal(self.snapshot_path, self.journal_path)
+        else:
+            with file_lock(self.snapshot_path):
+                write_json(self.snapshot_path, [])
+        return self.signature()
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS store_info (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS exercises (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL UNIQUE,
+    day TEXT,
+    workout_name TEXT,
+    completed_sets INTEGER,
+    total_sets INTEGER,
+    completion_percentage REAL,
+    meta TEXT
+);
+CREATE TABLE IF NOT EXISTS session_exercises (
+    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    ex_key TEXT NOT NULL,
+    exercise_id INTEGER NOT NULL REFERENCES exercises(id),
+    PRIMARY KEY (session_id, ex_key)
+);
+CREATE TABLE IF NOT EXISTS sets (
+    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    ex_key TEXT NOT NULL,
+    exercise_id INTEGER REFERENCES exercises(id),
+    pos INTEGER NOT NULL,
+    set_index TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    weight REAL,
+    reps TEXT,
+    rpe REAL
+);
+CREATE INDEX IF NOT EXISTS idx_sets_session ON sets(session_id, ex_key, pos);
+"""
+
+
+class SqliteHistoryStore:
+    """History normalised into sessions / sets / exercises tables.
+
+    The date column is UNIQUE (so indexed) and doubles as the entry id, which
+    also makes imports idempotent.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        with self._connect() as con:
+            con.executescript(SQLITE_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call: Streamlit serves each session
+        # from its own thread and sqlite3 connections are thread-bound.
+        con = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA foreign_keys=ON")
+            with con:  # commit on success, roll back on error
+                yield con
+        finally:
+            con.close()
+
+    # ---- writes ----
+
+    def _exercise_id(self, con, name):
+        con.execute("INSERT OR IGNORE INTO exercises(name) VALUES (?)", (name,))
+        return con.execute("SELECT id FROM exercises WHERE name = ?", (name,)).fetchone()[0]
+
+    def _insert(self, con, entry):
+        meta = dict(entry.get("meta") or {})
+        name_map = meta.pop("name_map", None) or {}
+        cur = con.execute(
+            "INSERT OR IGNORE INTO sessions(date, day, workout_name, completed_sets, total_sets, completion_percentage, meta)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (entry.get("date"), entry.get("day"), entry.get("workout_name"), entry.get("completed_sets"),
+             entry.get("total_sets"), entry.get("completion_percentage"), json.dumps(meta)),
+        )
+        if cur.rowcount == 0:
+            return False  # already stored
+        session_id = cur.lastrowid
+        ex_ids = {}
+        for ex_key, name in name_map.items():
+            ex_ids[ex_key] = self._exercise_id(con, name)
+            con.execute("INSERT INTO session_exercises VALUES (?, ?, ?)", (session_id, ex_key, ex_ids[ex_key]))
+        rows = []
+        for ex_key, sets_map in (entry.get("data") or {}).items():
+            for pos, (idx, slot) in enumerate((sets_map or {}).items()):
+                if not isinstance(slot, dict):
+                    slot = {"done": bool(slot)}
+                rows.append((session_id, ex_key, ex_ids.get(ex_key), pos, str(idx), int(bool(slot.get("done"))),
+                             slot.get("weight"), slot.get("reps"), slot.get("rpe")))
+        con.executemany("INSERT INTO sets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return True
+
+    @property
+    def key(self):
+        return ("sqlite", os.path.abspath(self.db_path))
+
+    def signature(self):
+        return file_signature(self.db_path, self.db_path + "-wal")
+
+    def append(self, entry):
+        """Insert `entry`. Returns the store signature just before and after the write."""
+        with file_lock(self.db_path):
+            before = self.signature()
+            with self._connect() as con:
+                self._insert(con, entry)
+            after = self.signature()
+        perf.count_write(len(json.dumps(entry, separators=(",", ":"))))  # payload size; SQLite pages aren't tracked
+        return before, after
+
+    def _import(self, con, entries):
+        added = 0
+        for entry in current_entries(entries):
+            if entry.get("date") and self._insert(con, entry):
+                added += 1
+        return added
+
+    def import_entries(self, entries):
+        """Insert entries not already present (matched by date). Returns the count added."""
+        with file_lock(self.db_path), self._connect() as con:
+            return self._import(con, entries)
+
+    def import_json(self, snapshot_path, journal_path=None):
+        return self.import_entries(JsonHistoryStore(snapshot_path, journal_path).load())
+
+    def import_json_once(self, snapshot_path, journal_path=None):
+        """First-start import of the JSON history, recorded in store_info.
+
+        Runs at most once per database: after that (or if the database
+        already held sessions) the JSON files are left alone, so a Clear
+        History can't be undone by the next restart. Returns the count added.
+        """
+        with file_lock(self.db_path), self._connect() as con:
+            if con.execute("SELECT 1 FROM store_info WHERE key = 'json_imported'").fetchone():
+                return 0
+            added = 0
+            if con.execute("SELECT 1 FROM sessions LIMIT 1").fetchone() is None:
+                added = self._import(con, JsonHistoryStore(snapshot_path, journal_path).load())
+            con.execute("INSERT INTO store_info VALUES ('json_imported', ?)", (json.dumps({"sessions": added}),))
+        return added
+
+    def clear(self):
+        with file_lock(self.db_path):
+            with self._connect() as con:
+                con.execute("DELETE FROM sets")
+                con.execute("DELETE FROM session_exercises")
+                con.execute("DELETE FROM sessions")
+            return self.signature()
+
+    # ---- reads ----
+
+    def _entries(self, con, session_rows):
+        if not session_rows:
+            return []
+        ids = [r[0] for r in session_rows]
+        marks = ",".join("?" * len(ids))
+        names = defaultdict(dict)
+        for sid, ex_key, name in con.execute(
+            f"SELECT se.session_id, se.ex_key, e.name FROM session_exercises se JOIN exercises e ON e.id = se.exercise_id"
+            f" WHERE se.session_id IN ({marks})", ids):
+            names[sid][ex_key] = name
+        data = defaultdict(dict)
+        for sid, ex_key, idx, done, weight, reps, rpe in con.execute(
+            f"SELECT session_id, ex_key, set_index, done, weight, reps, rpe FROM sets"
+            f" WHERE session_id IN ({marks}) ORDER BY session_id, rowid", ids):
+            data[sid].setdefault(ex_key, {})[idx] = {"done": bool(done), "weight": weight, "reps": reps, "rpe": rpe}
+        out = []
+        for sid, entry_date, day, workout_name, completed, total, pct, meta in session_rows:
+            meta = json.loads(meta) if meta else {}
+            if names[sid]:
+                meta["name_map"] = names[sid]
+            out.append({
+                "date": entry_date,
+                "day": day,
+                "workout_name": workout_name,
+                "completed_sets": completed,
+                "total_sets": total,
+                "completion_percentage": pct,
+                "data": data[sid],
+                "meta": meta,
+            })
+        return out
+
+    _SESSION_COLS = "id, date, day, workout_name, completed_sets, total_sets, completion_percentage, meta"
+
+    def load(self):
+        with self._connect() as con:
+            rows = con.execute(f"SELECT {self._SESSION_COLS} FROM sessions ORDER BY date").fetchall()
+            return self._entries(con, rows)
+
+    @staticmethod
+    def _date_range(since, until):
+        """WHERE clause for inclusive ISO day bounds; `until` covers that whole day."""
+        clauses, args = [], []
+        if since:
+            clauses.append("date >= ?")
+            args.append(since)
+        if until:
+            clauses.append("date < ?")
+            args.append((date.fromisoformat(until) + timedelta(days=1)).isoformat())
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def page(self, limit, offset=0, since=None, until=None):
+        """Newest-first window of sessions within an optional date range."""
+        where, args = self._date_range(since, until)
+        with self._connect() as con:
+            rows = con.execute(f"SELECT {self._SESSION_COLS} FROM sessions{where} ORDER BY date DESC LIMIT ? OFFSET ?",
+                               args + [limit, offset]).fetchall()
+            return self._entries(con, rows)
+
+    def count(self, since=None, until=None):
+        where, args = self._date_range(since, until)
+        with self._connect() as con:
+            return con.execute(f"SELECT COUNT(*) FROM sessions{where}", args).fetchone()[0]
+
+
+# =============================================================
+# Process-wide shared history
+# =============================================================
+
+def current_entries(entries):
+    """Entries at the current schema (migrated once, here, on load); non-entries are dropped."""
+    for entry in entries:
+        if isinstance(entry, packed.PackedEntry):
+            meta = entry.meta
+            current = isinstance(meta, dict) and meta.get("schema") == migrations.SCHEMA_VERSION
+            yield entry if current else migrations.migrate_entry(entry.to_json())
+        elif isinstance(entry, dict):
+            yield migrations.migrate_entry(entry)
+
+
+def history_version(history, prev=None):
+    """Content version of a history: a hash folded over every entry's content.
+
+    Folded one entry at a time, so extending a version by appended entries
+    gives the same value as hashing the whole history: O(n) once at load,
+    O(1) per append. Any edit to any entry (a hand-fixed load, a migration)
+    changes it.
+    """
+    version = prev or ""
+    for entry in history:
+        version = hashlib.sha1(version.encode() + packed.fingerprint(entry)).hexdigest()[:16]
+    return version
+
+
+class SharedHistory:
+    """One parsed copy of each store's history for the whole server process.
+
+    Sessions hold the returned tuple by reference instead of a private deep
+    copy, and must treat it (and its entries) as read-only. Entries are kept
+    as packed.PackedEntry, which reads like the JSON dict via get()/[]. Appends build a
+    new tuple (copy-on-write), so a session mid-render keeps a consistent
+    view. Every get() stats the store's files, so a write from any other
+    process or worker is picked up on the next rerun.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slots = {}  # store.key -> (signature, history tuple, version)
+
+    def get(self, store):
+        """Return (history, version), reloading only if the files changed."""
+        slot = self._slots.get(store.key)
+        if slot is None or slot[0] != store.signature():
+            with self._lock:
+                # Signature first: a write landing during load() only causes another reload
+                sig = store.signature()
+                slot = self._slots.get(store.key)
+                if slot is None or slot[0] != sig:
+                    history = tuple(packed.pack(e) for e in current_entries(store.load()))
+                    slot = self._slots[store.key] = (sig, history, history_version(history))
+        return slot[1], slot[2]
+
+    def append(self, store, entry):
+        before, after = store.append(entry)
+        with self._lock:
+            slot = self._slots.get(store.key)
+            if slot is not None and slot[0] == before:
+                # Nobody else wrote in between: extend instead of re-parsing
+                entry = packed.pack(entry)
+                slot = self._slots[store.key] = (after, slot[1] + (entry,), history_version([entry], slot[2]))
+                return slot[1], slot[2]
+        return self.get(store)
+
+    def clear(self, store):
+        with self._lock:
+            sig = store.clear()
+            self._slots[store.key] = (sig, (), history_version(()))
+        return (), self._slots[store.key][2]
+
+
+shared_histories = SharedHistory()
+
+
+def migrate_history_file(path, out_path=None, journal_path=None):
+    """Stream `path` (a workout_history.json) through migrations.migrate_entry.
+
+    Entries are read and written one at a time, so memory stays flat however
+    large the file is. With `out_path`, the snapshot and its journal (if
+    given) are streamed into that file and both inputs are left untouched.
+    In place, the journal is folded into `path` first and the result
+    atomically replaces it under its lock. Returns (entries, entries migrated).
+    """
+    if out_path is None and journal_path and (os.path.exists(journal_path) or os.path.exists(compacting_path(journal_path))):
+        compact_journal(path, journal_path)
+    target = out_path or path
+    counts = [0, 0]
+
+    def migrated():
+        for entry in iter_history(path, journal_path if out_path else None, strict=True):
+            entry = packed.unpack(entry)
+            if not isinstance(entry, dict):
+                continue
+            new = migrations.migrate_entry(entry)
+            counts[0] += 1
+            counts[1] += new is not entry
+            yield new
+
+    with file_lock(path, shared=out_path is not None):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(target)), prefix=os.path.basename(target) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                for chunk in iter_export(migrated(), "json"):
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, target)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+    return counts[0], counts[1]
+
+
+def open_history_store(backend, snapshot_path, journal_path=None, db_path=None):
+    """Return the history store for `backend` ("json" or "sqlite")."""
+    if backend == "sqlite":
+        store = SqliteHistoryStore(db_path)
+        # First start on SQLite: bring the existing JSON history across once
+        store.import_json_once(snapshot_path, journal_path)
+        return store
+    return JsonHistoryStore(snapshot_path, journal_path)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Workout data file utilities")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    imp = sub.add_parser("import-json", help="Import workout_history.json (+ .jsonl journal) into SQLite")
+    imp.add_argument("history", help="path to workout_history.json")
+    imp.add_argument("--db", default="workout.db", help="SQLite database to create or extend")
+    mig = sub.add_parser("migrate-history", help="Stream workout_history.json (+ .jsonl journal) up to the current schema")
+    mig.add_argument("history", help="path to workout_history.json")
+    mig.add_argument("-o", "--output", help="write here instead of replacing the file in place")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.history):
+        parser.error(f"not found: {args.history}")
+
+    if args.cmd == "import-json":
+        journal = os.path.splitext(args.history)[0] + ".jsonl"
+        added = SqliteHistoryStore(args.db).import_json(args.history, journal)
+        print(f"Imported {added} session(s) into {args.db}")
+    elif args.cmd == "migrate-history":
+        journal = os.path.splitext(args.history)[0] + ".jsonl"
+        total, changed = migrate_history_file(args.history, args.output, journal)
+        print(f"Migrated {changed} of {total} session(s) to schema v{migrations.SCHEMA_VERSION} in {args.output or args.history}")
+
+
+if __name__ == "__main__":
+    main()
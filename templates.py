@@ -0,0 +1,151 @@
+"""Workout templates and the per-deload plans compiled from them."""
+from collections import namedtuple
+from types import MappingProxyType
+
+# =============================================================
+# Templates — 3-day split for 10K performance, age-aware joints
+# Principles: heavy(ish) but low volume, unilateral control, elastic power,
+# calf-tendon stiffness, anti-rotation core. 30-minute cap.
+# =============================================================
+WORKOUT_TEMPLATES = {
+    "monday": {
+        "title": "A – Max Strength + Stiffness",
+        "emoji": "🔵",
+        "time_cap_min": 30,
+        "blocks": [
+            {"name": "Warm‑up (3–4 min)", "items": [
+                {"name": "Jump rope – easy", "sets": 1, "reps": "2–3 min", "cat": "warmup", "note": "Soft, quick contacts."},
+                {"name": "Hip openers + ankle rocks", "sets": 1, "reps": "6/side", "cat": "warmup", "note": "Grease range."},
+            ]},
+            {"name": "Strength A (Superset)", "items": [
+                {"name": "Goblet squat (KB 24kg or DB 22.5kg)", "sets": 4, "reps": "5", "cat": "strength", "note": "RPE 8; 75–90s btw supersets."},
+                {"name": "1‑arm DB row (22.5kg)", "sets": 4, "reps": "6/arm", "cat": "strength", "note": "Brace. Pull to hip."},
+            ]},
+            {"name": "Posterior Chain Power", "items": [
+                {"name": "KB swings (24kg)", "sets": 3, "reps": "10", "cat": "power", "note": "Explode. 60–75s rest."},
+            ]},
+            {"name": "Tendon Stiffness", "items": [
+                {"name": "Standing calf raise slow tempo", "sets": 3, "reps": "10 @ 2‑1‑2", "cat": "tendon", "note": "Heels to floor; pause top."},
+            ]},
+            {"name": "Core – Anti‑extension", "items": [
+                {"name": "Ab wheel rollouts", "sets": 3, "reps": "6–10", "cat": "core", "note": "Ribs down, glutes on."},
+            ]},
+            {"name": "Cooldown", "items": [
+                {"name": "Hip flexor + calves", "sets": 1, "reps": "45–60s/each", "cat": "cooldown", "note": "Easy breathe."}
+            ]},
+        ],
+    },
+    "wednesday": {
+        "title": "B – Unilateral + Elastic",
+        "emoji": "🟢",
+        "time_cap_min": 30,
+        "blocks": [
+            {"name": "Warm‑up (3–4 min)", "items": [
+                {"name": "Jump rope – high knees", "sets": 1, "reps": "90s", "cat": "warmup", "note": "Cues cadence."},
+                {"name": "Walking lunges + leg swings", "sets": 1, "reps": "8/side", "cat": "warmup", "note": "Tall posture."},
+            ]},
+            {"name": "Strength B (Unilateral Superset)", "items": [
+                {"name": "Bulgarian split squat (15kg)", "sets": 3, "reps": "6/leg", "cat": "strength", "note": "Bench for rear foot."},
+                {"name": "Single‑leg RDL (12.5–15kg)", "sets": 3, "reps": "6/leg", "cat": "strength", "note": "Hips square; reach long."},
+            ]},
+            {"name": "Elastic Power", "items": [
+                {"name": "Lateral bounds to stick", "sets": 3, "reps": "5/side", "cat": "power", "note": "Quiet landing, 2s hold."},
+                {"name": "Ankle pogos", "sets": 2, "reps": "20s", "cat": "power", "note": "Stiff ankles; quick."},
+            ]},
+            {"name": "Carries + Anti‑rotation", "items": [
+                {"name": "Suitcase carry (KB 24kg)", "sets": 2, "reps": "20–30m/side", "cat": "accessory", "note": "Don’t lean."},
+                {"name": "Pallof press (band)", "sets": 2, "reps": "8–10/side", "cat": "core", "note": "Resist twist; slow."},
+            ]},
+            {"name": "Cooldown", "items": [
+                {"name": "T‑spine + hips", "sets": 1, "reps": "45–60s/each", "cat": "cooldown", "note": "Downshift."}
+            ]},
+        ],
+    },
+    "friday": {
+        "title": "C – Posterior Chain + Core",
+        "emoji": "🟣",
+        "time_cap_min": 30,
+        "blocks": [
+            {"name": "Warm‑up (3–4 min)", "items": [
+                {"name": "Jump rope – easy", "sets": 1, "reps": "2 min", "cat": "warmup", "note": "Nose-breathe."},
+                {"name": "Glute bridge + ham curls (band)", "sets": 1, "reps": "10 + 10", "cat": "warmup", "note": "Wake posterior chain."},
+            ]},
+            {"name": "Strength C (Superset)", "items": [
+                {"name": "DB hip thrust (shoulders on bench, 22.5kg)", "sets": 4, "reps": "6–8", "cat": "strength", "note": "2s hold at top."},
+                {"name": "DB overhead press (12.5–15kg)", "sets": 3, "reps": "6–8", "cat": "strength", "note": "Ribs down; no lean."},
+            ]},
+            {"name": "Calf‑Achilles", "items": [
+                {"name": "Seated/leaning calf raises (DB on knee)", "sets": 3, "reps": "8–10 @ 2‑1‑2", "cat": "tendon", "note": "Slow eccentrics."},
+            ]},
+            {"name": "Core – Rotary", "items": [
+                {"name": "Russian twists (light/mod)", "sets": 3, "reps": "10/side", "cat": "core", "note": "Rotate through ribs."},
+                {"name": "Side plank", "sets": 2, "reps": "30–45s/side", "cat": "core", "note": "Long line."},
+            ]},
+            {"name": "Cooldown", "items": [
+                {"name": "Hamstrings + hip flexor", "sets": 1, "reps": "45–60s/each", "cat": "cooldown", "note": "Easy breath."}
+            ]},
+        ],
+    },
+}
+
+
+# =============================================================
+# Compiled plans — each template flattened once at import
+# =============================================================
+# Deload drops one set from multi-set strength/tendon items
+DELOAD_CATS = ("strength", "tendon")
+
+# Parallel tuples with one position per exercise, in render order. `blocks`
+# holds (block name, start, stop) ranges into them; `sets` is the visible set
+# count for this plan's deload flag, `base_sets`/`deload_sets` both variants.
+Plan = namedtuple(
+    "Plan",
+    "day title emoji deload keys names cats reps notes base_sets deload_sets sets blocks name_map total_sets",
+)
+
+
+def ex_key(block_i, item_i):
+    return f"b{block_i}_i{item_i}"
+
+
+def deload_set_count(sets, cat):
+    return sets - 1 if sets > 1 and cat in DELOAD_CATS else sets
+
+
+def compile_plan(day, deload=False):
+    template = WORKOUT_TEMPLATES[day]
+    keys, items, blocks = [], [], []
+    for b_i, block in enumerate(template["blocks"]):
+        start = len(keys)
+        for i_i, it in enumerate(block["items"]):
+            keys.append(ex_key(b_i, i_i))
+            items.append(it)
+        blocks.append((block["name"], start, len(keys)))
+    base_sets = tuple(it["sets"] for it in items)
+    deload_sets = tuple(deload_set_count(it["sets"], it["cat"]) for it in items)
+    sets = deload_sets if deload else base_sets
+    names = tuple(it["name"] for it in items)
+    return Plan(
+        day=day,
+        title=template["title"],
+        emoji=template["emoji"],
+        deload=deload,
+        keys=tuple(keys),
+        names=names,
+        cats=tuple(it["cat"] for it in items),
+        reps=tuple(it["reps"] for it in items),
+        notes=tuple(it.get("note", "") for it in items),
+        base_sets=base_sets,
+        deload_sets=deload_sets,
+        sets=sets,
+        blocks=tuple(blocks),
+        name_map=MappingProxyType(dict(zip(keys, names))),
+        total_sets=sum(sets),
+    )
+
+
+PLANS = {(day, deload): compile_plan(day, deload) for day in WORKOUT_TEMPLATES for deload in (False, True)}
+
+
+def plan_for(day, deload=False):
+    return PLANS[(day, bool(deload))]
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrations  # noqa: E402
+from templates import plan_for  # noqa: E402
+
+
+def make_entry(date, day="monday", deload=False, weight=20.0, rpe=7.0):
+    """A history entry as Finish & Save writes it."""
+    plan = plan_for(day, deload)
+    data = {
+        ex_key: {str(s): {"done": s % 2 == 0, "weight": weight, "reps": None, "rpe": rpe} for s in range(sets)}
+        for ex_key, sets in zip(plan.keys, plan.sets)
+    }
+    total = sum(plan.sets)
+    done = sum(slot["done"] for sets_map in data.values() for slot in sets_map.values())
+    return {
+        "date": date,
+        "day": day,
+        "workout_name": plan.title,
+        "completed_sets": done,
+        "total_sets": total,
+        "completion_percentage": round(done / total * 100, 1),
+        "data": data,
+        "meta": {"schema": migrations.SCHEMA_VERSION, "duration_sec": 1800, "name_map": dict(plan.name_map), "deload": deload},
+    }
+
+
+@pytest.fixture
+def entries():
+    days = ("monday", "wednesday", "friday")
+    return [make_entry(f"2024-01-{i + 1:02d}T06:30:00.{i:06d}", days[i % 3], deload=i == 4, weight=20.0 + i) for i in range(6)]
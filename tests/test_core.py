@@ -0,0 +1,52 @@
+import json
+import os
+
+import pytest
+
+import analytics
+import core
+import packed
+import storage
+
+
+@pytest.fixture
+def shard(tmp_path, entries):
+    path = str(tmp_path / core.HISTORY_FILE)
+    storage.write_json(path, entries)
+    return path
+
+
+def expected(path):
+    return core.analytics_report(analytics.flatten(storage.current_entries(storage.iter_history(path))))
+
+
+def sync_cache(path, history):
+    analytics.SetCache(os.path.join(os.path.dirname(path), core.SETS_DIR)).sync(tuple(packed.pack(e) for e in history))
+
+
+def test_report_version_matches_the_app(shard, entries):
+    assert core.report(entries)["version"] == storage.history_version(entries)
+    assert core.report_file(shard)["version"] == storage.history_version(entries)
+
+
+@pytest.mark.parametrize("cached", [0, 4, 6])
+def test_report_file_analytics_reads_the_history_once(monkeypatch, shard, entries, cached):
+    if cached:
+        sync_cache(shard, entries[:cached])
+    passes = []
+    iter_json_array = storage.iter_json_array
+    monkeypatch.setattr(storage, "iter_json_array", lambda *a, **k: passes.append(a) or iter_json_array(*a, **k))
+    rep = core.report_file(shard, with_analytics=True)
+    assert len(passes) == 1
+    monkeypatch.undo()
+    assert {k: rep[k] for k in ("e1rm", "acwr")} == expected(shard)
+
+
+def test_report_file_analytics_ignores_a_cache_of_edited_entries(shard, entries):
+    sync_cache(shard, entries)
+    edited = json.loads(json.dumps(entries))
+    edited[0]["data"]["b1_i0"]["0"].update(done=True, weight=999.0)
+    storage.write_json(shard, edited)
+    rep = core.report_file(shard, with_analytics=True)
+    assert {k: rep[k] for k in ("e1rm", "acwr")} == expected(shard)
+    assert max(r["e1rm"] for r in rep["e1rm"]) > 999
@@ -0,0 +1,46 @@
+import copy
+
+import migrations
+from conftest import make_entry
+
+LEGACY = [
+    {"date": "2023-05-01T07:00:00", "day": "monday", "data": {"b1_i0": {"0": True, "1": False}}},
+    {"date": "2023-05-03T07:00:00", "day": "wednesday", "data": {"b1_i0": {"0": {"done": True, "weight": 22.5}}},
+     "meta": {"duration_sec": 1700}, "completed_sets": 1, "total_sets": 3},
+    {"date": "2023-05-05T07:00:00", "data": None, "meta": "broken", "note": "kept"},
+]
+
+
+def test_migrate_entry_brings_legacy_entries_to_the_current_schema():
+    for entry in LEGACY:
+        new = migrations.migrate_entry(copy.deepcopy(entry))
+        assert migrations.entry_is_current(new)
+        assert list(new)[:len(migrations.ENTRY_FIELDS)] == list(migrations.ENTRY_FIELDS)
+        for sets_map in new["data"].values():
+            for slot in sets_map.values():
+                assert list(slot) == ["done", "weight", "reps", "rpe"]
+    first = migrations.migrate_entry(copy.deepcopy(LEGACY[0]))
+    assert (first["completed_sets"], first["total_sets"], first["completion_percentage"]) == (1, 2, 50.0)
+    assert migrations.migrate_entry(copy.deepcopy(LEGACY[2]))["note"] == "kept"
+
+
+def test_migrate_entry_is_idempotent():
+    for entry in LEGACY:
+        once = migrations.migrate_entry(copy.deepcopy(entry))
+        twice = migrations.migrate_entry(copy.deepcopy(once))
+        assert twice == once
+        assert migrations.migrate_entry(once) is once
+
+
+def test_current_entries_are_returned_untouched():
+    entry = make_entry("2024-01-01T06:30:00")
+    assert migrations.migrate_entry(entry) is entry
+
+
+def test_migrate_state_is_idempotent():
+    legacy = {"monday": {"b1_i0": {"0": True}}, "tuesday": {"x": {}}, "_rev": 7}
+    once = migrations.migrate_state(copy.deepcopy(legacy))
+    assert once["_schema"] == migrations.SCHEMA_VERSION and once["_rev"] == 7
+    assert set(once) == {"_schema", "_rev"} | set(migrations.DAYS)
+    assert migrations.migrate_state(once) is once
+    assert migrations.migrate_state(copy.deepcopy(once)) == once
@@ -0,0 +1,71 @@
+import copy
+import json
+
+import pytest
+
+import packed
+from conftest import make_entry
+
+
+def round_trip(entry):
+    row = json.loads(json.dumps(packed.to_row(entry), separators=(",", ":")))
+    return packed.from_line(row).to_json()
+
+
+def test_json_pack_row_json_is_byte_identical(entries):
+    for entry in entries:
+        assert json.dumps(round_trip(entry), indent=2) == json.dumps(entry, indent=2)
+
+
+def test_round_trip_keeps_entries_that_cannot_be_packed():
+    entry = make_entry("2024-02-01T06:30:00")
+    entry["data"]["b1_i0"] = {"0": True, "1": {"done": 1}}  # older schema slots
+    entry["data"]["b1_i1"]["0"]["weight"] = 20  # int, would come back as 20.0
+    entry["meta"]["name_map"]["b1_i0"] = "Renamed squat"  # no longer the template's name_map
+    entry["note"] = "extra top-level key"
+    del entry["completion_percentage"]
+    assert json.dumps(round_trip(entry), indent=2) == json.dumps(entry, indent=2)
+
+
+def test_packed_entry_reads_like_the_json_entry(entries):
+    entry = entries[0]
+    p = packed.pack(entry)
+    assert p["date"] == entry["date"]
+    assert p.get("data") == entry["data"]
+    assert p.get("meta") == entry["meta"]
+    assert p.get("missing", 1) == 1
+    assert "data" in p and "missing" not in p
+    with pytest.raises(KeyError):
+        p["missing"]
+
+
+@pytest.mark.parametrize("edit", [
+    lambda e: e["data"]["b1_i0"]["0"].update(weight=999.0),
+    lambda e: e["data"]["b1_i0"]["1"].update(done=True),
+    lambda e: e["data"]["b1_i0"]["2"].update(rpe=None),
+    lambda e: e["data"]["b1_i0"]["0"].update(reps=5.0),
+    lambda e: e["data"]["b1_i0"].pop("3"),
+    lambda e: e["meta"].update(duration_sec=1801),
+    lambda e: e["meta"]["name_map"].update(b1_i0="Front squat"),
+    lambda e: e.update(completed_sets=0),
+])
+def test_fingerprint_changes_on_any_edit(entries, edit):
+    entry = entries[0]
+    edited = copy.deepcopy(entry)
+    edit(edited)
+    assert packed.fingerprint(edited) != packed.fingerprint(entry)
+
+
+def test_fingerprint_is_the_same_for_every_form(entries):
+    entry = entries[0]
+    fp = packed.fingerprint(entry)
+    assert packed.fingerprint(copy.deepcopy(entry)) == fp
+    assert packed.fingerprint(packed.from_line(packed.to_row(entry))) == fp
+
+
+def test_columns_and_set_rows_match_between_forms(entries):
+    for entry in entries:
+        p = packed.pack(entry)
+        assert list(packed.exercise_columns(p, packed.FIELDS)) == list(packed.exercise_columns(entry, packed.FIELDS))
+        assert list(packed.set_rows(p)) == list(packed.set_rows(entry))
+        assert packed.summary(p) == packed.summary(entry)
@@ -0,0 +1,173 @@
+import json
+import os
+
+import pytest
+
+import packed
+import storage
+
+
+def as_json(history):
+    return [packed.unpack(e) for e in history]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "workout_history.json"), str(tmp_path / "workout_history.jsonl")
+
+
+def journal_store(paths, entries):
+    snapshot, journal = paths
+    storage.write_json(snapshot, entries[:2])
+    store = storage.JsonHistoryStore(snapshot, journal)
+    for entry in entries[2:]:
+        store.append(entry)
+    return store
+
+
+def test_journal_appends_and_compaction(paths, entries):
+    snapshot, journal = paths
+    store = journal_store(paths, entries)
+    assert as_json(store.load()) == entries
+    storage.compact_journal(snapshot, journal)
+    assert not os.path.exists(journal)
+    assert storage.read_json(snapshot, None) == entries
+    assert as_json(store.load()) == entries
+
+
+def test_compaction_crash_before_snapshot_write(paths, entries):
+    snapshot, journal = paths
+    store = journal_store(paths, entries[:4])
+    # Crashed right after moving the journal aside; a new append followed
+    os.replace(journal, storage.compacting_path(journal))
+    store.append(entries[4])
+    assert as_json(store.load()) == entries[:5]
+    assert as_json(storage.iter_history(snapshot, journal)) == entries[:5]
+    storage.compact_journal(snapshot, journal)
+    assert not os.path.exists(storage.compacting_path(journal))
+    assert as_json(store.load()) == entries[:5]
+
+
+def test_compaction_crash_after_snapshot_write(paths, entries):
+    snapshot, journal = paths
+    journal_store(paths, entries)
+    # Crashed after the snapshot was replaced, before .compacting was removed
+    os.replace(journal, storage.compacting_path(journal))
+    storage.write_json(snapshot, entries)
+    store = storage.JsonHistoryStore(snapshot, journal)
+    assert as_json(store.load()) == entries
+    assert as_json(storage.iter_history(snapshot, journal)) == entries
+    storage.compact_journal(snapshot, journal)
+    assert storage.read_json(snapshot, None) == entries
+
+
+def test_torn_journal_line_is_skipped(paths, entries):
+    snapshot, journal = paths
+    store = journal_store(paths, entries[:3])
+    with open(journal, "a") as f:
+        f.write('{"p": 1, "date": "2024-')  # crash mid-append
+    store.append(entries[3])
+    assert as_json(store.load()) == entries[:4]
+
+
+def test_history_version_extends_by_appended_entries(entries):
+    whole = storage.history_version(entries)
+    assert storage.history_version(entries[3:], storage.history_version(entries[:3])) == whole
+    assert storage.history_version(packed.pack(e) for e in entries) == whole
+    edited = json.loads(json.dumps(entries))
+    edited[0]["data"]["b1_i0"]["0"]["weight"] = 999.0
+    assert storage.history_version(edited) != whole
+
+
+def test_shared_history_append_matches_a_fresh_load(paths, entries):
+    snapshot, journal = paths
+    store = journal_store(paths, entries[:5])
+    shared = storage.SharedHistory()
+    shared.get(store)
+    history, version = shared.append(store, entries[5])
+    assert as_json(history) == entries
+    assert storage.SharedHistory().get(store)[1] == version
+
+
+def test_sqlite_store_round_trip(tmp_path, entries):
+    store = storage.SqliteHistoryStore(str(tmp_path / "workout.db"))
+    assert store.import_entries(entries) == len(entries)
+    assert store.import_entries(entries) == 0  # matched by date
+    assert store.load() == entries
+    assert store.count() == len(entries)
+    assert store.page(2) == entries[:-3:-1]
+    assert store.count(since="2024-01-02", until="2024-01-04") == 3
+    assert store.page(10, since="2024-01-02", until="2024-01-04") == entries[3:0:-1]
+    store.clear()
+    assert store.load() == [] and store.count() == 0
+
+
+def test_sqlite_first_start_imports_json_once(tmp_path, paths, entries):
+    snapshot, journal = paths
+    journal_store(paths, entries)
+    db = str(tmp_path / "workout.db")
+    store = storage.open_history_store("sqlite", snapshot, journal, db)
+    assert store.load() == entries
+    store.clear()
+    # A restart after Clear History must not bring the JSON history back
+    assert storage.open_history_store("sqlite", snapshot, journal, db).load() == []
+
+
+LEGACY = [{"date": f"2023-05-0{i}T07:00:00", "day": "monday", "data": {"b1_i0": {"0": True}}} for i in range(1, 4)]
+
+
+def read_bytes(*paths):
+    return [open(p, "rb").read() for p in paths]
+
+
+def test_migrate_history_to_output_leaves_inputs_untouched(tmp_path, paths, entries):
+    snapshot, journal = paths
+    storage.write_json(snapshot, LEGACY)
+    store = storage.JsonHistoryStore(snapshot, journal)
+    for entry in entries[:2]:
+        store.append(entry)
+    before = read_bytes(snapshot, journal)
+    out = str(tmp_path / "out.json")
+    assert storage.migrate_history_file(snapshot, out, journal) == (5, 3)
+    assert read_bytes(snapshot, journal) == before
+    migrated = storage.read_json(out, None)
+    assert [e["date"] for e in migrated] == [e["date"] for e in LEGACY + entries[:2]]
+    assert migrated[3:] == entries[:2]
+
+
+def test_migrate_history_in_place_folds_the_journal(paths, entries):
+    snapshot, journal = paths
+    storage.write_json(snapshot, LEGACY)
+    storage.JsonHistoryStore(snapshot, journal).append(entries[0])
+    assert storage.migrate_history_file(snapshot, journal_path=journal) == (4, 3)
+    assert not os.path.exists(journal)
+    assert storage.read_json(snapshot, None)[3] == entries[0]
+    assert storage.migrate_history_file(snapshot, journal_path=journal) == (4, 0)
+
+
+ARRAYS = [
+    [],
+    [1, 2.5],
+    [0, -1, 10, 2.5, -0.125, 1e3, 6.02e23, -1.5e-07, 123456789012345678],
+    ["", "a", "a, b]", "quote \" and \\ backslash", "ünïcode ✅", "x" * 40],
+    [True, False, None, [], {}, [[1, [2.5]], {"a": [None]}]],
+    [{"date": "2024-01-01", "data": {"b1_i0": {"0": {"done": True, "weight": 22.5, "reps": None, "rpe": 7}}}}, 3.75],
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 4, 5, 7, 16, 1 << 16])
+@pytest.mark.parametrize("data", ARRAYS)
+def test_iter_json_array_across_chunk_boundaries(tmp_path, data, chunk_size):
+    path = tmp_path / "array.json"
+    for text in (json.dumps(data), json.dumps(data, indent=2), json.dumps(data, separators=(",", ":"))):
+        path.write_text(text, encoding="utf-8")
+        assert list(storage.iter_json_array(str(path), chunk_size)) == data
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1 << 16])
+@pytest.mark.parametrize("text", ["{}", "[1, 2", "[1 2]", "[1,]", "[2.]"])
+def test_iter_json_array_rejects_malformed_files(tmp_path, text, chunk_size):
+    path = tmp_path / "bad.json"
+    path.write_text(text)
+    with pytest.raises(ValueError):
+        list(storage.iter_json_array(str(path), chunk_size))
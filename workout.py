@@ -1,10 +1,23 @@
 import streamlit as st
+import importlib
+import io
 import json
-import pandas as pd
-import plotly.graph_objects as go
+import streamlit.components.v1 as components
+import bisect
+import functools
 from datetime import datetime, timedelta
 import os
-from collections import defaultdict
+import re
+
+import core
+import migrations
+import packed
+import perf
+import storage
+from templates import plan_for
+
+# Timing spans + write counters for this rerun; closed by finish_trace()
+perf.begin()
 
 # =============================================================
 # Page config — mobile-first, distraction-free
@@ -20,16 +33,54 @@ st.set_page_config(
 # Constants & Files
 # =============================================================
 DATA_DIR = "."
-WORKOUT_DATA_FILE = os.path.join(DATA_DIR, "workout_data.json")
-WORKOUT_HISTORY_FILE = os.path.join(DATA_DIR, "workout_history.json")
-SCHEMA_VERSION = 4  # v4: 3-day split, time caps, progression tips, deload toggle
+# Each athlete (?athlete=<id> or the Settings field) gets its own shard
+# directory under ATHLETES_DIR; with no athlete the files sit in DATA_DIR.
+# The per-file paths (WORKOUT_DATA_FILE etc.) are resolved once the athlete
+# is known — see "Athlete shard" below.
+ATHLETES_DIR = os.path.join(DATA_DIR, "athletes")
+# Journal mode: each saved session is appended as one JSON line instead of
+# rewriting the whole history; compacted into the snapshot in the background.
+HISTORY_JOURNAL_MODE = True
+# History backend: "json" (snapshot + journal above) or "sqlite" (indexed
+# sessions/sets/exercises tables; imports existing JSON history on first start)
+STORAGE_BACKEND = os.environ.get("WORKOUT_STORAGE", "json")
+SCHEMA_VERSION = migrations.SCHEMA_VERSION  # v4: 3-day split, time caps, progression tips, deload toggle
 SESSION_CAP_MIN = 30  # 30-minute sessions by design
+# Rest timer: "fragment" ticks only the timer via st.fragment(run_every=...),
+# "client" counts down in the browser; "auto" picks fragment when available.
+REST_TIMER_MODE = "auto"
+REST_TIMER_TICK_SEC = 1
+# "sections": only the selected view's code runs each rerun; "tabs": st.tabs (all run)
+NAV_MODE = "sections"
+# Workout progress indicator: "ring" (CSS, no plotly) or "gauge" (plotly Indicator)
+PROGRESS_STYLE = "ring"
+# Load/RPE logging: "form" batches an exercise's inputs behind one submit
+# (one rerun, one write); "live" saves on every input change
+LOG_MODE = "form"
+# Workout layout: "cards" (a card per exercise: set buttons, actions, log
+# expander) or "compact" (one HTML block per template block; only each
+# unfinished exercise's next set gets inputs). Settings toggle, ?layout=compact
+WORKOUT_LAYOUT = "cards"
+HISTORY_PAGE_SIZE = 10  # sessions rendered per History page
+ANALYTICS_CACHE_ENTRIES = 16  # memoized analytics results kept per function (LRU-style eviction)
+ANALYTICS_WEEKS = 26  # weekly category volume chart window
+ACWR_DAYS = 180  # acute:chronic chart window
+# Time-series charts are LTTB-downsampled on the server to at most this many
+# points per trace (WebGL traces), so the figure payload doesn't grow with history
+CHART_MAX_POINTS = 300
+# Performance panel (Settings, or any view with ?debug=perf): reruns kept per
+# session, and the JSONL file each finished rerun is appended to when enabled
+PERF_RUNS_KEPT = 20
+PERF_TRACE_FILE = os.path.join(DATA_DIR, "perf_trace.jsonl")
 
 # =============================================================
 # Compatibility helpers (Streamlit versions)
 # =============================================================
 
 def safe_rerun():
+    # st.rerun() aborts the script, so pending writes (and this rerun's trace) must land first
+    flush_state()
+    finish_trace()
     if hasattr(st, "rerun"):
         st.rerun()
     elif hasattr(st, "experimental_rerun"):
@@ -48,10 +99,39 @@ def ui_segmented(label, options, default, format_func=lambda x: x):
     return st.radio(label, options, index=idx, format_func=format_func, horizontal=True)
 
 
+class LazyModule:
+    """Module proxy that imports on first attribute access.
+
+    pandas and plotly dominate cold start but are only needed for charts and
+    tables, so the Workout view renders without ever importing them.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+pd = LazyModule("pandas")
+go = LazyModule("plotly.graph_objects")
+analytics = LazyModule("analytics")  # imports pandas/NumPy
+
+
 def ui_container_border():
     return st.container()
 
 
+def ui_form(key: str):
+    try:
+        return st.form(key=key, border=False)
+    except TypeError:  # border= needs Streamlit 1.29
+        return st.form(key=key)
+
+
 def safe_toast(msg: str):
     if hasattr(st, "toast"):
         st.toast(msg)
@@ -87,11 +167,76 @@ def set_query_param(key: str, value: str):
             pass
 
 
+def ui_fragment(run_every=None):
+    """Decorator factory for st.fragment (or its experimental name); None if unsupported."""
+    frag = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+    if frag is None:
+        return None
+    return frag(run_every=run_every)
+
+
+def download_accepts_callable():
+    try:
+        from streamlit.elements.widgets.button import DownloadButtonDataType
+    except ImportError:
+        return False
+    return "Callable" in str(DownloadButtonDataType)
+
+
+def ui_download_button(label, build, file_name, mime, key):
+    """Download button whose payload is only built when the user asks for it."""
+    if download_accepts_callable():
+        # Newer Streamlit calls `build` on click, off the script thread
+        return st.download_button(label, data=build, file_name=file_name, mime=mime, key=key, use_container_width=True)
+    # Older Streamlit needs the bytes up front: build them on an explicit click
+    if st.button(f"Prepare {file_name}", key=f"{key}_prepare", use_container_width=True):
+        st.session_state[key] = build()
+    if key in st.session_state:
+        return st.download_button(label, data=st.session_state[key], file_name=file_name, mime=mime, key=key + "_btn", use_container_width=True)
+    return False
+
+
 def ui_toggle(label: str, value: bool):
     if hasattr(st, "toggle"):
         return st.toggle(label, value=value)
     return st.checkbox(label, value=value)
 
+# =============================================================
+# Athlete shard — all data files are per athlete
+# =============================================================
+
+def athlete_id(raw):
+    """Normalise a free-form athlete name into a safe directory name ("" = default)."""
+    return re.sub(r"[^a-z0-9_-]+", "-", (raw or "").strip().lower()).strip("-")[:64]
+
+
+def shard_dir(athlete):
+    return os.path.join(ATHLETES_DIR, athlete) if athlete else DATA_DIR
+
+
+def switch_athlete(raw):
+    """Flush the current athlete's pending writes, then reload everything for `raw`."""
+    flush_state()
+    st.session_state.athlete = athlete_id(raw)
+    set_query_param("athlete", st.session_state.athlete)
+    for key in ("workout_data", "progress", "history", "exercise_index", "history_version",
+                "history_page", "history_range", "history_open", "state_dirty", "dirty_paths"):
+        st.session_state.pop(key, None)
+    safe_rerun()
+
+
+if "athlete" not in st.session_state:
+    st.session_state.athlete = athlete_id(get_query_param("athlete", ""))
+
+SHARD_DIR = shard_dir(st.session_state.athlete)
+os.makedirs(SHARD_DIR, exist_ok=True)
+WORKOUT_DATA_FILE = os.path.join(SHARD_DIR, "workout_data.json")
+WORKOUT_HISTORY_FILE = os.path.join(SHARD_DIR, "workout_history.json")
+WORKOUT_HISTORY_JOURNAL = os.path.join(SHARD_DIR, "workout_history.jsonl")
+WORKOUT_DB_FILE = os.path.join(SHARD_DIR, "workout.db")
+WORKOUT_INDEX_FILE = os.path.join(SHARD_DIR, "workout_index.json")  # per-exercise last/PR aggregates
+WORKOUT_SETS_DIR = os.path.join(SHARD_DIR, "workout_sets")  # memory-mapped per-set columns (analytics.SetCache)
+
 # =============================================================
 # Global styles (light/dark + generous spacing)
 # =============================================================
@@ -124,6 +269,16 @@ st.markdown(
       .pr { background:#FEF9C3; color:#854D0E; border:1px solid #FDE68A; }
       .timecap { background:#ECFCCB; color:#3F6212; }
 
+      .ex-card.compact { padding:6px 14px; }
+      .ex-row { padding:10px 0; border-bottom:1px solid var(--line); }
+      .ex-row:last-child { border-bottom:none; }
+      .ex-row.done { color:var(--muted); padding:6px 0; }
+      .ex-meta { color:var(--muted); font-size:13px; margin-top:4px; }
+      .set-dots { letter-spacing:3px; color:#10B981; font-size:13px; }
+
+      .ring { --pct:0; width:150px; height:150px; margin: var(--space-2) auto; border-radius:50%; display:grid; place-items:center; background: conic-gradient(#10B981 calc(var(--pct) * 1%), var(--line) 0); }
+      .ring>span { width:118px; height:118px; border-radius:50%; display:grid; place-items:center; background: var(--card); font-weight:800; font-size:30px; }
+
       .sticky-wrap { margin-top: var(--space-4); }
       .sticky-bar { position: sticky; bottom: 10px; z-index: 50; background: rgba(255,255,255,0.96); backdrop-filter: blur(8px); border:1px solid var(--line); padding:12px; border-radius: var(--radius); display:flex; gap:12px; box-shadow: 0 10px 30px rgba(0,0,0,0.08); }
 
@@ -139,121 +294,80 @@ st.markdown(
 )
 
 # =============================================================
-# Templates — 3-day split for 10K performance, age-aware joints
-# Principles: heavy(ish) but low volume, unilateral control, elastic power,
-# calf-tendon stiffness, anti-rotation core. 30-minute cap.
-# =============================================================
-WORKOUT_TEMPLATES = {
-    "monday": {
-        "title": "A – Max Strength + Stiffness",
-        "emoji": "🔵",
-        "time_cap_min": 30,
-        "blocks": [
-            {"name": "Warm‑up (3–4 min)", "items": [
-                {"name": "Jump rope – easy", "sets": 1, "reps": "2–3 min", "cat": "warmup", "note": "Soft, quick contacts."},
-                {"name": "Hip openers + ankle rocks", "sets": 1, "reps": "6/side", "cat": "warmup", "note": "Grease range."},
-            ]},
-            {"name": "Strength A (Superset)", "items": [
-                {"name": "Goblet squat (KB 24kg or DB 22.5kg)", "sets": 4, "reps": "5", "cat": "strength", "note": "RPE 8; 75–90s btw supersets."},
-                {"name": "1‑arm DB row (22.5kg)", "sets": 4, "reps": "6/arm", "cat": "strength", "note": "Brace. Pull to hip."},
-            ]},
-            {"name": "Posterior Chain Power", "items": [
-                {"name": "KB swings (24kg)", "sets": 3, "reps": "10", "cat": "power", "note": "Explode. 60–75s rest."},
-            ]},
-            {"name": "Tendon Stiffness", "items": [
-                {"name": "Standing calf raise slow tempo", "sets": 3, "reps": "10 @ 2‑1‑2", "cat": "tendon", "note": "Heels to floor; pause top."},
-            ]},
-            {"name": "Core – Anti‑extension", "items": [
-                {"name": "Ab wheel rollouts", "sets": 3, "reps": "6–10", "cat": "core", "note": "Ribs down, glutes on."},
-            ]},
-            {"name": "Cooldown", "items": [
-                {"name": "Hip flexor + calves", "sets": 1, "reps": "45–60s/each", "cat": "cooldown", "note": "Easy breathe."}
-            ]},
-        ],
-    },
-    "wednesday": {
-        "title": "B – Unilateral + Elastic",
-        "emoji": "🟢",
-        "time_cap_min": 30,
-        "blocks": [
-            {"name": "Warm‑up (3–4 min)", "items": [
-                {"name": "Jump rope – high knees", "sets": 1, "reps": "90s", "cat": "warmup", "note": "Cues cadence."},
-                {"name": "Walking lunges + leg swings", "sets": 1, "reps": "8/side", "cat": "warmup", "note": "Tall posture."},
-            ]},
-            {"name": "Strength B (Unilateral Superset)", "items": [
-                {"name": "Bulgarian split squat (15kg)", "sets": 3, "reps": "6/leg", "cat": "strength", "note": "Bench for rear foot."},
-                {"name": "Single‑leg RDL (12.5–15kg)", "sets": 3, "reps": "6/leg", "cat": "strength", "note": "Hips square; reach long."},
-            ]},
-            {"name": "Elastic Power", "items": [
-                {"name": "Lateral bounds to stick", "sets": 3, "reps": "5/side", "cat": "power", "note": "Quiet landing, 2s hold."},
-                {"name": "Ankle pogos", "sets": 2, "reps": "20s", "cat": "power", "note": "Stiff ankles; quick."},
-            ]},
-            {"name": "Carries + Anti‑rotation", "items": [
-                {"name": "Suitcase carry (KB 24kg)", "sets": 2, "reps": "20–30m/side", "cat": "accessory", "note": "Don’t lean."},
-                {"name": "Pallof press (band)", "sets": 2, "reps": "8–10/side", "cat": "core", "note": "Resist twist; slow."},
-            ]},
-            {"name": "Cooldown", "items": [
-                {"name": "T‑spine + hips", "sets": 1, "reps": "45–60s/each", "cat": "cooldown", "note": "Downshift."}
-            ]},
-        ],
-    },
-    "friday": {
-        "title": "C – Posterior Chain + Core",
-        "emoji": "🟣",
-        "time_cap_min": 30,
-        "blocks": [
-            {"name": "Warm‑up (3–4 min)", "items": [
-                {"name": "Jump rope – easy", "sets": 1, "reps": "2 min", "cat": "warmup", "note": "Nose-breathe."},
-                {"name": "Glute bridge + ham curls (band)", "sets": 1, "reps": "10 + 10", "cat": "warmup", "note": "Wake posterior chain."},
-            ]},
-            {"name": "Strength C (Superset)", "items": [
-                {"name": "DB hip thrust (shoulders on bench, 22.5kg)", "sets": 4, "reps": "6–8", "cat": "strength", "note": "2s hold at top."},
-                {"name": "DB overhead press (12.5–15kg)", "sets": 3, "reps": "6–8", "cat": "strength", "note": "Ribs down; no lean."},
-            ]},
-            {"name": "Calf‑Achilles", "items": [
-                {"name": "Seated/leaning calf raises (DB on knee)", "sets": 3, "reps": "8–10 @ 2‑1‑2", "cat": "tendon", "note": "Slow eccentrics."},
-            ]},
-            {"name": "Core – Rotary", "items": [
-                {"name": "Russian twists (light/mod)", "sets": 3, "reps": "10/side", "cat": "core", "note": "Rotate through ribs."},
-                {"name": "Side plank", "sets": 2, "reps": "30–45s/side", "cat": "core", "note": "Long line."},
-            ]},
-            {"name": "Cooldown", "items": [
-                {"name": "Hamstrings + hip flexor", "sets": 1, "reps": "45–60s/each", "cat": "cooldown", "note": "Easy breath."}
-            ]},
-        ],
-    },
-}
-
-# =============================================================
-# Cache helpers — load/save/migrate
+# File helpers — save/migrate
 # =============================================================
-@st.cache_data(show_spinner=False)
-def load_json(path, fallback):
-    if os.path.exists(path):
-        try:
-            with open(path, "r") as f:
-                return json.load(f)
-        except Exception:
-            return fallback
-    return fallback
-
-
 def save_json(path, data):
     try:
-        with open(path, "w") as f:
-            json.dump(data, f, indent=2)
+        with perf.span("save_json"), storage.file_lock(path):
+            storage.write_json(path, data)
     except Exception as e:
         safe_toast(f"Could not save {os.path.basename(path)}: {e}")
 
+
+@st.cache_resource(show_spinner=False)
+def get_history_store(backend, shard):
+    # `shard` only keys the cache: one store per athlete directory
+    return storage.open_history_store(
+        backend,
+        WORKOUT_HISTORY_FILE,
+        WORKOUT_HISTORY_JOURNAL if HISTORY_JOURNAL_MODE else None,
+        WORKOUT_DB_FILE,
+    )
+
+
+HISTORY_STORE = get_history_store(STORAGE_BACKEND, SHARD_DIR)
+
+
+def sync_history():
+    """Point this session at the process-wide parsed history.
+
+    No per-session copy: the shared tuple is only re-parsed when the files
+    change, and a change made by another tab or worker shows up here on
+    the next rerun.
+    """
+    with perf.span("history_sync"):
+        history, version = storage.shared_histories.get(HISTORY_STORE)
+    if version != st.session_state.get("history_version"):
+        st.session_state.history = history
+        st.session_state.history_version = version
+        st.session_state.pop("exercise_index", None)  # revalidate against the new history
+
+
+def save_history_entry(entry):
+    """Persist one new history entry and adopt the extended shared history."""
+    try:
+        with perf.span("history_append"):
+            history, version = storage.shared_histories.append(HISTORY_STORE, entry)
+    except Exception as e:
+        safe_toast(f"Could not save history: {e}")
+        return False
+    st.session_state.history = history
+    st.session_state.history_version = version
+    return True
+
+
+def clear_history_file():
+    try:
+        st.session_state.history, st.session_state.history_version = storage.shared_histories.clear(HISTORY_STORE)
+    except Exception as e:
+        safe_toast(f"Could not clear history: {e}")
+
 # =============================================================
 # Session State + Migration
 # =============================================================
-if "schema" not in st.session_state:
-    st.session_state.schema = SCHEMA_VERSION
 if "workout_data" not in st.session_state:
-    st.session_state.workout_data = load_json(WORKOUT_DATA_FILE, {"_schema": SCHEMA_VERSION, "monday": {}, "wednesday": {}, "friday": {}})
-if "history" not in st.session_state:
-    st.session_state.history = load_json(WORKOUT_HISTORY_FILE, [])
+    # Migrated once per load (history entries are migrated as they're loaded,
+    # see storage.current_entries); an upgrade is written back so the file is
+    # stamped with the current _schema from then on.
+    # Read from disk per session (not memoized): a new tab or reload must see
+    # the latest _rev and sets, not whatever the process read first
+    loaded = storage.read_json(WORKOUT_DATA_FILE, migrations.empty_state())
+    with perf.span("migrate"):
+        st.session_state.workout_data = migrations.migrate_state(loaded)
+    if st.session_state.workout_data is not loaded:
+        st.session_state.state_dirty = True
+        st.session_state.dirty_paths = None
+sync_history()
 if "selected_day" not in st.session_state:
     st.session_state.selected_day = get_query_param("day", "monday")
 if "rest_timer_end" not in st.session_state:
@@ -266,85 +380,162 @@ if "confetti_on_save" not in st.session_state:
     st.session_state.confetti_on_save = True
 if "deload_mode" not in st.session_state:
     st.session_state.deload_mode = False  # reduce sets/intensity when on
-
-# Migration from older schemas
-
-def migrate(data):
-    if isinstance(data, dict) and data.get("_schema") == SCHEMA_VERSION:
-        return data
-    migrated = {"_schema": SCHEMA_VERSION, "monday": {}, "wednesday": {}, "friday": {}}
-    # attempt to carry over any existing day data keys
-    for day in ("monday", "wednesday", "friday", "tuesday", "thursday"):
-        day_data = (data or {}).get(day, {})
-        if not isinstance(day_data, dict):
-            continue
-        new_day = {}
-        for ex_key, sets_map in day_data.items():
-            new_day[ex_key] = {}
-            for idx, val in sets_map.items():
-                if isinstance(val, dict):
-                    slot = {
-                        "done": bool(val.get("done")),
-                        "weight": val.get("weight"),
-                        "reps": val.get("reps"),
-                        "rpe": val.get("rpe"),
-                    }
-                else:
-                    slot = {"done": bool(val), "weight": None, "reps": None, "rpe": None}
-                new_day[ex_key][str(idx)] = slot
-        if day in migrated:
-            migrated[day] = new_day
-    return migrated
-
-st.session_state.workout_data = migrate(st.session_state.workout_data)
+if "compact_layout" not in st.session_state:
+    st.session_state.compact_layout = get_query_param("layout", WORKOUT_LAYOUT) == "compact"
 
 # =============================================================
 # Utility functions
 # =============================================================
 
-def ex_key_from(block_i, item_i):
-    return f"b{block_i}_i{item_i}"
+def empty_slot():
+    return {"done": False, "weight": None, "reps": None, "rpe": None}
+
+
+def save_state(*path):
+    """Mark workout_data dirty at `path` (day[, ex_key[, set]]); no path = whole document.
 
+    The write itself is coalesced into flush_state().
+    """
+    st.session_state.state_dirty = True
+    dirty = st.session_state.setdefault("dirty_paths", set())
+    if dirty is not None:
+        if path:
+            dirty.add(path)
+        else:
+            st.session_state.dirty_paths = None
 
-def save_state():
-    save_json(WORKOUT_DATA_FILE, st.session_state.workout_data)
+
+def flush_state():
+    """Write workout_data at most once per rerun, and only if something changed.
+
+    Optimistic: if another tab/worker saved since we loaded, only our dirty
+    paths are replayed onto theirs, and we adopt the merged result.
+    """
+    if not st.session_state.get("state_dirty"):
+        return
+    try:
+        with perf.span("flush_state"):
+            merged = storage.save_versioned(
+                WORKOUT_DATA_FILE,
+                st.session_state.workout_data,
+                st.session_state.workout_data.get("_rev", 0),
+                st.session_state.get("dirty_paths", set()),
+            )
+    except Exception as e:
+        safe_toast(f"Could not save {os.path.basename(WORKOUT_DATA_FILE)}: {e}")
+        return
+    if merged["_rev"] != st.session_state.workout_data.get("_rev", 0) + 1:
+        st.session_state.pop("progress", None)  # merged in another tab's edits; recount
+    st.session_state.workout_data = merged
+    st.session_state.state_dirty = False
+    st.session_state.dirty_paths = set()
+
+
+def finish_trace():
+    """Close this rerun's trace: keep it for the perf panel, optionally append it to PERF_TRACE_FILE."""
+    trace = perf.end()
+    if trace is None:
+        return
+    trace.label = st.session_state.get("section", "")
+    record = trace.as_dict()
+    runs = st.session_state.setdefault("perf_runs", [])
+    runs.append(record)
+    del runs[:-PERF_RUNS_KEPT]
+    if st.session_state.get("perf_trace_file"):
+        try:
+            with storage.file_lock(PERF_TRACE_FILE), open(PERF_TRACE_FILE, "a") as f:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        except Exception as e:
+            safe_toast(f"Could not write {os.path.basename(PERF_TRACE_FILE)}: {e}")
+
+
+def update_slot(day, ex_key, set_index, field, value):
+    """Set one slot field; no-op (no dirty flag) when the value is unchanged."""
+    current = st.session_state.workout_data.get(day, {}).get(ex_key, {}).get(str(set_index))
+    if (current or empty_slot()).get(field) == value:
+        return False
+    sets_map = st.session_state.workout_data.setdefault(day, {}).setdefault(ex_key, {})
+    slot = current if current is not None else empty_slot()
+    slot[field] = value
+    sets_map[str(set_index)] = slot
+    save_state(day, ex_key, str(set_index))
+    if field == "done":
+        progress_add(day, ex_key, set_index, 1 if value else -1)
+    return True
 
 
 def set_done(day, ex_key, set_index, done):
-    st.session_state.workout_data.setdefault(day, {}).setdefault(ex_key, {})
-    slot = st.session_state.workout_data[day][ex_key].get(str(set_index), {"done": False, "weight": None, "reps": None, "rpe": None})
-    slot["done"] = done
-    st.session_state.workout_data[day][ex_key][str(set_index)] = slot
-    save_state()
+    update_slot(day, ex_key, set_index, "done", done)
 
 
 def set_set_detail(day, ex_key, set_index, field, value):
-    st.session_state.workout_data.setdefault(day, {}).setdefault(ex_key, {})
-    slot = st.session_state.workout_data[day][ex_key].get(str(set_index), {"done": False, "weight": None, "reps": None, "rpe": None})
-    slot[field] = value
-    st.session_state.workout_data[day][ex_key][str(set_index)] = slot
-    save_state()
+    update_slot(day, ex_key, set_index, field, value)
+
+
+# ---- Done/total counters per day and exercise ----
+# Built from workout_data once per day (and again when deload changes the
+# visible set counts), then kept current by update_slot() and progress_reset(),
+# so progress and card state are lookups instead of template walks.
+
+def day_plan(day):
+    """Compiled template for `day` with the current deload setting (see templates.compile_plan)."""
+    return plan_for(day, st.session_state.deload_mode)
+
+
+def build_progress(day):
+    plan = day_plan(day)
+    counts = {"done": 0, "total": plan.total_sets, "ex": {}}
+    day_data = st.session_state.workout_data.get(day, {})
+    for k, sets in zip(plan.keys, plan.sets):
+        sets_map = day_data.get(k, {})
+        done = sum(1 for s in range(sets) if sets_map.get(str(s), {}).get("done"))
+        counts["ex"][k] = [done, sets]
+        counts["done"] += done
+    return counts
+
+
+def day_progress(day):
+    progress = st.session_state.get("progress")
+    if progress is None or progress["deload"] != st.session_state.deload_mode:
+        progress = st.session_state.progress = {"deload": st.session_state.deload_mode, "days": {}}
+    if day not in progress["days"]:
+        progress["days"][day] = build_progress(day)
+    return progress["days"][day]
+
+
+def progress_add(day, ex_key, set_index, delta):
+    """Count one set flipping done (+1) or undone (-1); sets hidden by deload don't count."""
+    counts = st.session_state.get("progress", {}).get("days", {}).get(day)
+    ex = counts["ex"].get(ex_key) if counts else None
+    if ex is None or set_index >= ex[1]:
+        return
+    ex[0] += delta
+    counts["done"] += delta
+
+
+def progress_reset(day, ex_key=None):
+    """Zero the done counters after a day (or one exercise) was cleared."""
+    counts = st.session_state.get("progress", {}).get("days", {}).get(day)
+    if counts is None:
+        return
+    for k, ex in counts["ex"].items():
+        if ex_key is None or k == ex_key:
+            counts["done"] -= ex[0]
+            ex[0] = 0
 
 
 def compute_progress(day):
-    total_sets = 0
-    done_sets = 0
-    for b_i, block in enumerate(WORKOUT_TEMPLATES[day]["blocks"]):
-        for i_i, it in enumerate(block["items"]):
-            sets = it["sets"]
-            # Apply deload: reduce sets by 1 (min 1)
-            if st.session_state.deload_mode and sets > 1 and it["cat"] in ("strength", "tendon"):
-                sets -= 1
-            total_sets += sets
-            k = ex_key_from(b_i, i_i)
-            for s in range(sets):
-                if st.session_state.workout_data.get(day, {}).get(k, {}).get(str(s), {}).get("done"):
-                    done_sets += 1
+    counts = day_progress(day)
+    done_sets, total_sets = counts["done"], counts["total"]
     pct = (done_sets / total_sets * 100) if total_sets else 0
     return done_sets, total_sets, round(pct, 1)
 
 
 def progress_ring(pct):
+    if PROGRESS_STYLE != "gauge":
+        # Pure CSS ring: no plotly import, a single small markdown delta
+        st.markdown(f"<div class='ring' style='--pct:{pct}'><span>{pct:g}%</span></div>", unsafe_allow_html=True)
+        return
     fig = go.Figure(go.Indicator(
         mode="gauge+number",
         value=pct,
@@ -357,18 +548,65 @@ def progress_ring(pct):
 
 def start_rest(seconds: int):
     st.session_state.rest_timer_end = (datetime.utcnow() + timedelta(seconds=seconds)).isoformat()
+    st.session_state.rest_done = False
+
+
+def rest_remaining():
+    if not st.session_state.rest_timer_end:
+        return None
+    end = datetime.fromisoformat(st.session_state.rest_timer_end)
+    return (end - datetime.utcnow()).total_seconds()
+
+
+def rest_tick():
+    """Body of the ticking rest fragment: reruns alone, never the whole script."""
+    remaining = rest_remaining()
+    if remaining is None:
+        return
+    if remaining <= 0:
+        st.session_state.rest_timer_end = None
+        st.session_state.rest_done = True
+        # One full rerun to show the result and stop the ticker
+        safe_rerun()
+    else:
+        st.info(f"Rest: {int(remaining)}s remaining…")
+
+
+def rest_countdown_html(seconds):
+    """Client-side countdown; the browser ticks, the server never reruns."""
+    components.html(
+        f"""
+        <div id="rest" style="font-family:sans-serif; padding:12px 16px; border-radius:12px;
+             background:#DBEAFE; color:#1E40AF; font-weight:600;"></div>
+        <script>
+          const end = Date.now() + {int(seconds * 1000)};
+          const el = document.getElementById("rest");
+          function tick() {{
+            const left = Math.ceil((end - Date.now()) / 1000);
+            if (left <= 0) {{ el.textContent = "Rest done. Go! 💥"; el.style.background = "#DCFCE7"; el.style.color = "#166534"; return; }}
+            el.textContent = "Rest: " + left + "s remaining…";
+            setTimeout(tick, 250);
+          }}
+          tick();
+        </script>
+        """,
+        height=56,
+    )
 
 
 def rest_widget():
-    if st.session_state.rest_timer_end:
-        end = datetime.fromisoformat(st.session_state.rest_timer_end)
-        remaining = (end - datetime.utcnow()).total_seconds()
-        if remaining <= 0:
+    remaining = rest_remaining()
+    if remaining is None or remaining <= 0:
+        if remaining is not None or st.session_state.get("rest_done"):
             st.success("Rest done. Go! 💥")
-            st.session_state.rest_timer_end = None
-        else:
-            st.info(f"Rest: {int(remaining)}s remaining…")
-            safe_rerun()
+        st.session_state.rest_timer_end = None
+        st.session_state.rest_done = False
+        return
+    fragment = ui_fragment(run_every=REST_TIMER_TICK_SEC) if REST_TIMER_MODE in ("auto", "fragment") else None
+    if fragment is not None:
+        fragment(rest_tick)()
+    else:
+        rest_countdown_html(remaining)
 
 
 def elapsed_widget():
@@ -390,45 +628,28 @@ def session_cap_widget():
         ss = int(remaining % 60)
         st.caption(f"🕒 Time left in session: {mm:02d}:{ss:02d}")
 
-# ---- History helpers: last used load/RPE per exercise name ----
+# ---- Exercise index: last used load/RPE + max-load PR per exercise name ----
+# Persisted next to the history and folded forward in O(sets) on every save,
+# so prefills and PR badges never rescan the history. Rebuilt from scratch
+# only when it doesn't match the loaded history (first run, Clear History,
+# import, or another process saved in the meantime). The fold itself lives
+# in core.py.
 
-def build_last_values():
-    last = {}
-    for entry in sorted(st.session_state.history, key=lambda x: x.get("date", "")):
-        data = entry.get("data", {})
-        name_map = entry.get("meta", {}).get("name_map", {})
-        for ex_key, sets_map in data.items():
-            ex_name = name_map.get(ex_key)
-            if not ex_name:
-                continue
-            w_vals = [v.get("weight") for v in sets_map.values() if isinstance(v, dict) and v.get("weight")]
-            r_vals = [v.get("rpe") for v in sets_map.values() if isinstance(v, dict) and v.get("rpe")]
-            if w_vals or r_vals:
-                last[ex_name] = {
-                    "weight": (w_vals[-1] if w_vals else None),
-                    "rpe": (r_vals[-1] if r_vals else None),
-                }
-    return last
-
-LAST_VALUES = build_last_values()
-
-# ---- Personal Records (simple) — max weight per exercise name ----
-
-def compute_prs():
-    prs = defaultdict(float)
-    for entry in st.session_state.history:
-        data = entry.get("data", {})
-        name_map = entry.get("meta", {}).get("name_map", {})
-        for ex_key, sets_map in data.items():
-            ex_name = name_map.get(ex_key)
-            if not ex_name:
-                continue
-            for slot in sets_map.values():
-                if isinstance(slot, dict) and slot.get("weight"):
-                    prs[ex_name] = max(prs[ex_name], float(slot["weight"]))
-    return prs
+@perf.timed("exercise_index")
+def load_exercise_index():
+    index = storage.read_json(WORKOUT_INDEX_FILE, None)
+    version = st.session_state.history_version
+    if not core.index_matches(index, st.session_state.history, version):
+        index = core.build_exercise_index(st.session_state.history)
+        index["_version"] = version
+        save_json(WORKOUT_INDEX_FILE, index)
+    return index
+
+
+if "exercise_index" not in st.session_state:
+    st.session_state.exercise_index = load_exercise_index()
 
-PRS = compute_prs()
+EXERCISE_INDEX = st.session_state.exercise_index["exercises"]
 
 # =============================================================
 # Header
@@ -442,7 +663,7 @@ st.markdown(
 )
 
 date_label = datetime.now().strftime("%a, %b %d")
-st.caption(f"📅 {date_label}")
+st.caption(f"📅 {date_label}" + (f" · 👤 {st.session_state.athlete}" if st.session_state.athlete else ""))
 elapsed_widget()
 session_cap_widget()
 
@@ -450,53 +671,95 @@ session_cap_widget()
 st.info("Pro tip: keep rests 60–90s on supersets; 75s default. Power work gets quality over fatigue. If short on time, skip last accessory block and hit cooldown.")
 
 # =============================================================
-# Tabs
+# History-derived caches — reused across reruns until history changes
 # =============================================================
-main_tab, analytics_tab, history_tab, settings_tab = st.tabs([
-    "🏋️ Workout",
-    "📊 Analytics",
-    "📅 History",
-    "⚙️ Settings",
-])
+# One copy per history version for the whole process, like the analytics
+# frames below; `_history` stays out of the arg hashing.
+
+@st.cache_resource(max_entries=ANALYTICS_CACHE_ENTRIES, show_spinner=False)
+def date_index(version, _history):
+    return sorted((str(e.get("date", "")), i) for i, e in enumerate(_history))
+
+
+def history_date_index():
+    """Ascending (date, position) pairs; re-sorted only when the history version changes."""
+    return date_index(st.session_state.history_version, st.session_state.history)
+
+
+def history_window(start=None, end=None):
+    """Bounds [lo, hi) of the date index covering ISO dates start..end (inclusive days)."""
+    index = history_date_index()
+    lo = bisect.bisect_left(index, (start,)) if start else 0
+    hi = bisect.bisect_left(index, ((datetime.fromisoformat(end) + timedelta(days=1)).date().isoformat(),)) if end else len(index)
+    return lo, max(lo, hi)
+
+
+def history_page(page, page_size, start=None, end=None):
+    """One page of entries, newest first, plus the number of entries in range."""
+    if STORAGE_BACKEND == "sqlite":
+        return (
+            HISTORY_STORE.page(page_size, page * page_size, since=start, until=end),
+            HISTORY_STORE.count(since=start, until=end),
+        )
+    index = history_date_index()
+    lo, hi = history_window(start, end)
+    top = hi - page * page_size
+    window = index[max(lo, top - page_size):max(lo, top)]
+    return [st.session_state.history[i] for _, i in reversed(window)], hi - lo
+
 
 # =============================================================
 # Workout tab
 # =============================================================
-with main_tab:
-    col_day, col_prog = st.columns([1, 1])
-    with col_day:
-        day = ui_segmented(
-            "Day",
-            options=["monday", "wednesday", "friday"],
-            default=st.session_state.selected_day,
-            format_func=lambda d: f"{WORKOUT_TEMPLATES[d]['emoji']} {d.title()}",
-        )
-        st.session_state.selected_day = day
-        set_query_param("day", day)
-    with col_prog:
-        done, total, pct = compute_progress(day)
-        progress_ring(pct)
-        st.caption(f"{done}/{total} sets complete")
+def log_inputs(day, k, sets_to_show, sets_map, last_w, last_rpe):
+    """Weight/RPE inputs for one exercise, prefilled with the last logged values.
+
+    Returns [(set index, weight, rpe)] as currently shown in the inputs.
+    """
+    values = []
+    dcols = st.columns(3)
+    for s in range(sets_to_show):
+        slot = sets_map.get(str(s), empty_slot())
+        with dcols[s % 3]:
+            w_default = float(slot["weight"]) if slot["weight"] is not None else float(last_w or 0.0)
+            w = st.number_input(
+                f"Wgt (s{s+1})",
+                min_value=0.0,
+                value=w_default,
+                step=0.5,
+                key=f"w_{day}_{k}_{s}",
+            )
+            r_default = float(slot["rpe"]) if slot["rpe"] is not None else float(last_rpe or 0.0)
+            r = st.number_input(
+                f"RPE (s{s+1})",
+                min_value=0.0,
+                max_value=10.0,
+                value=r_default,
+                step=0.5,
+                key=f"rpe_{day}_{k}_{s}",
+            )
+        values.append((s, w, r))
+    return values
+
+
+def commit_log(day, k, values):
+    for s, w, r in values:
+        set_set_detail(day, k, s, "weight", w if w > 0 else None)
+        set_set_detail(day, k, s, "rpe", r if r > 0 else None)
 
-    # Render blocks
-    name_map = {}  # ex_key -> exercise display name for metadata
-    for b_i, block in enumerate(WORKOUT_TEMPLATES[day]["blocks"]):
-        st.markdown(f"<div class='section-head'>{block['name']}</div>", unsafe_allow_html=True)
-        for i_i, it in enumerate(block["items"]):
-            k = ex_key_from(b_i, i_i)
-            name_map[k] = it["name"]
 
-            sets_cfg = it["sets"]
-            # Apply deload mode: reduce sets by 1 for strength/tendon where possible
-            sets_to_show = sets_cfg
-            if st.session_state.deload_mode and sets_cfg > 1 and it["cat"] in ("strength", "tendon"):
-                sets_to_show = sets_cfg - 1
+def render_exercise_cards(day, plan):
+    for b_i, (block_name, start, stop) in enumerate(plan.blocks):
+        st.markdown(f"<div class='section-head'>{block_name}</div>", unsafe_allow_html=True)
+        for i in range(start, stop):
+            k, name, cat = plan.keys[i], plan.names[i], plan.cats[i]
 
             sets_map = st.session_state.workout_data.get(day, {}).get(k, {})
-            done_sets = sum(1 for s in range(sets_to_show) if sets_map.get(str(s), {}).get("done"))
+            # Deload-adjusted set count and done count, both from the counters
+            done_sets, sets_to_show = day_progress(day)["ex"][k]
             is_done = done_sets == sets_to_show
 
-            pr_weight = PRS.get(it["name"])
+            pr_weight = EXERCISE_INDEX.get(name, {}).get("max_load")
             pr_html = f"<span class='badge pr'>PR {pr_weight:g}kg</span>" if pr_weight else ""
             timecap_html = "<span class='badge timecap'>30‑min cap</span>" if b_i == 0 else ""
 
@@ -504,11 +767,11 @@ with main_tab:
                 st.markdown(
                     f"<div class='ex-card {'done' if is_done else ''}'>"
                     f"<div style='display:flex; align-items:center; justify-content:space-between; gap:10px;'>"
-                    f"<div style='min-width:60%;'><strong>{'✅' if is_done else '⭕'} {it['name']}</strong>"
-                    f"<span class='badge {it['cat']}'>{it['cat']}</span>{pr_html} {timecap_html}</div>"
-                    f"<div style='font-size:12px; color:#64748b; text-align:right;'>{it['reps']}</div>"
+                    f"<div style='min-width:60%;'><strong>{'✅' if is_done else '⭕'} {name}</strong>"
+                    f"<span class='badge {cat}'>{cat}</span>{pr_html} {timecap_html}</div>"
+                    f"<div style='font-size:12px; color:#64748b; text-align:right;'>{plan.reps[i]}</div>"
                     f"</div>"
-                    f"<div style='color:#64748b; margin:8px 0 12px 0;'>{it.get('note','')}</div>"
+                    f"<div style='color:#64748b; margin:8px 0 12px 0;'>{plan.notes[i]}</div>"
                     f"</div>",
                     unsafe_allow_html=True,
                 )
@@ -523,7 +786,8 @@ with main_tab:
                 with q2:
                     if st.button("Reset exercise ↺", key=f"reset_{day}_{k}"):
                         st.session_state.workout_data.get(day, {}).pop(k, None)
-                        save_state()
+                        progress_reset(day, k)
+                        save_state(day, k)
                 with q3:
                     if st.button("Start rest ⏱️", key=f"rest_{day}_{k}"):
                         start_rest(int(st.session_state.auto_rest or 75))
@@ -531,7 +795,7 @@ with main_tab:
                 cols = st.columns(min(sets_to_show, 6))
                 for s in range(sets_to_show):
                     with cols[s % 6]:
-                        slot = sets_map.get(str(s), {"done": False, "weight": None, "reps": None, "rpe": None})
+                        slot = sets_map.get(str(s), empty_slot())
                         label = f"Set {s+1}"
                         if st.button(f"{'✅' if slot['done'] else label}", key=f"btn_{day}_{k}_{s}"):
                             set_done(day, k, s, not slot["done"])
@@ -539,36 +803,133 @@ with main_tab:
                                 start_rest(int(st.session_state.auto_rest))
 
                 # Per-set logging — prefill with last values
-                last_w = LAST_VALUES.get(it["name"], {}).get("weight")
-                last_rpe = LAST_VALUES.get(it["name"], {}).get("rpe")
+                last_w = EXERCISE_INDEX.get(name, {}).get("weight")
+                last_rpe = EXERCISE_INDEX.get(name, {}).get("rpe")
                 with st.expander("Log load / RPE (optional)"):
-                    dcols = st.columns(3)
-                    for s in range(sets_to_show):
-                        slot = sets_map.get(str(s), {"done": False, "weight": None, "reps": None, "rpe": None})
-                        with dcols[s % 3]:
-                            w_default = float(slot["weight"]) if slot["weight"] is not None else float(last_w or 0.0)
-                            w = st.number_input(
-                                f"Wgt (s{s+1})",
-                                min_value=0.0,
-                                value=w_default,
-                                step=0.5,
-                                key=f"w_{day}_{k}_{s}",
-                            )
-                            set_set_detail(day, k, s, "weight", w if w > 0 else None)
-
-                            r_default = float(slot["rpe"]) if slot["rpe"] is not None else float(last_rpe or 0.0)
-                            r = st.number_input(
-                                f"RPE (s{s+1})",
-                                min_value=0.0,
-                                max_value=10.0,
-                                value=r_default,
-                                step=0.5,
-                                key=f"rpe_{day}_{k}_{s}",
-                            )
-                            set_set_detail(day, k, s, "rpe", r if r > 0 else None)
+                    if LOG_MODE == "form":
+                        # Edits stay in the browser until submit: one rerun + one flush per exercise
+                        with ui_form(f"log_{day}_{k}"):
+                            values = log_inputs(day, k, sets_to_show, sets_map, last_w, last_rpe)
+                            if st.form_submit_button("Save loads / RPE", use_container_width=True):
+                                commit_log(day, k, values)
+                                safe_toast(f"Logged {name}.")
+                    else:
+                        commit_log(day, k, log_inputs(day, k, sets_to_show, sets_map, last_w, last_rpe))
 
                 st.markdown("<div style='height:12px'></div>", unsafe_allow_html=True)
 
+
+def next_set_index(sets_map, sets_to_show):
+    return next((s for s in range(sets_to_show) if not sets_map.get(str(s), {}).get("done")), None)
+
+
+def last_done_index(sets_map, sets_to_show):
+    return next((s for s in reversed(range(sets_to_show)) if sets_map.get(str(s), {}).get("done")), None)
+
+
+def complete_set(day, k, s):
+    """Compact-layout submit: log the next set's load/RPE and mark it done.
+
+    Runs as the form's on_click callback, i.e. before the rerun renders, so
+    the block drawn in that same rerun already shows the set as done.
+    """
+    w = st.session_state.get(f"cw_{day}_{k}") or 0.0
+    r = st.session_state.get(f"crpe_{day}_{k}") or 0.0
+    set_set_detail(day, k, s, "weight", w if w > 0 else None)
+    set_set_detail(day, k, s, "rpe", r if r > 0 else None)
+    set_done(day, k, s, True)
+    if st.session_state.auto_rest:
+        start_rest(int(st.session_state.auto_rest))
+
+
+def undo_set(day, k, s):
+    """Compact-layout undo (on_click callback, like complete_set): un-mark one set; logged values stay."""
+    set_done(day, k, s, False)
+
+
+def compact_block_html(day, plan, b_i, block_name, start, stop):
+    """One block's exercises as a single HTML string; finished ones collapse to one line."""
+    timecap_html = "<span class='badge timecap'>30‑min cap</span>" if b_i == 0 else ""
+    rows = []
+    for i in range(start, stop):
+        k, name, cat = plan.keys[i], plan.names[i], plan.cats[i]
+        sets_map = st.session_state.workout_data.get(day, {}).get(k, {})
+        done_sets, sets_to_show = day_progress(day)["ex"][k]
+        dots = "".join("●" if sets_map.get(str(s), {}).get("done") else "○" for s in range(sets_to_show))
+        if done_sets == sets_to_show:
+            rows.append(f"<div class='ex-row done'>✅ {name} <span class='set-dots'>{dots}</span></div>")
+            continue
+        pr_weight = EXERCISE_INDEX.get(name, {}).get("max_load")
+        pr_html = f"<span class='badge pr'>PR {pr_weight:g}kg</span>" if pr_weight else ""
+        rows.append(
+            f"<div class='ex-row'><strong>⭕ {name}</strong><span class='badge {cat}'>{cat}</span>{pr_html}"
+            f"<div class='ex-meta'>{plan.reps[i]} · {plan.notes[i]}</div>"
+            f"<div class='set-dots'>{dots} {done_sets}/{sets_to_show}</div></div>"
+        )
+    return (
+        f"<div class='section-head'>{block_name}{timecap_html}</div>"
+        f"<div class='ex-card compact'>{''.join(rows)}</div>"
+    )
+
+
+def render_compact_blocks(day, plan):
+    """Compact layout: per block, one HTML element plus a small form per unfinished
+    exercise and an undo button per finished one."""
+    for b_i, (block_name, start, stop) in enumerate(plan.blocks):
+        st.markdown(compact_block_html(day, plan, b_i, block_name, start, stop), unsafe_allow_html=True)
+        for i in range(start, stop):
+            k, name = plan.keys[i], plan.names[i]
+            sets_map = st.session_state.workout_data.get(day, {}).get(k, {})
+            done_sets, sets_to_show = day_progress(day)["ex"][k]
+            s = next_set_index(sets_map, sets_to_show)
+            last = last_done_index(sets_map, sets_to_show)
+            if s is None:
+                # Collapsed: a single button to reopen the last set after a mis-tap
+                st.button(f"↺ {name} · set {last+1}", key=f"undo_{day}_{k}", on_click=undo_set, args=(day, k, last))
+                continue
+            # Prefill from the set before (today), else the last session
+            prev = sets_map.get(str(s - 1), {}) if s else {}
+            logged = EXERCISE_INDEX.get(name, {})
+            w_default = prev.get("weight") or logged.get("weight") or 0.0
+            r_default = prev.get("rpe") or logged.get("rpe") or 0.0
+            with ui_form(f"next_{day}_{k}"):
+                c1, c2, c3 = st.columns([2, 1, 1])
+                with c1:
+                    st.number_input(f"{name} (kg)", min_value=0.0, value=float(w_default), step=0.5, key=f"cw_{day}_{k}")
+                with c2:
+                    st.number_input("RPE", min_value=0.0, max_value=10.0, value=float(r_default), step=0.5, key=f"crpe_{day}_{k}")
+                with c3:
+                    st.form_submit_button(
+                        f"✅ Set {s+1}", on_click=complete_set, args=(day, k, s), use_container_width=True
+                    )
+                    if last is not None:
+                        st.form_submit_button(
+                            f"↺ Set {last+1}", on_click=undo_set, args=(day, k, last), use_container_width=True
+                        )
+
+
+def render_workout():
+    col_day, col_prog = st.columns([1, 1])
+    with col_day:
+        day = ui_segmented(
+            "Day",
+            options=["monday", "wednesday", "friday"],
+            default=st.session_state.selected_day,
+            format_func=lambda d: f"{plan_for(d).emoji} {d.title()}",
+        )
+        st.session_state.selected_day = day
+        set_query_param("day", day)
+    with col_prog:
+        done, total, pct = compute_progress(day)
+        progress_ring(pct)
+        st.caption(f"{done}/{total} sets complete")
+
+    plan = day_plan(day)
+    if st.session_state.compact_layout:
+        render_compact_blocks(day, plan)
+    else:
+        render_exercise_cards(day, plan)
+
     # Sticky Actions bar
     with st.container():
         st.markdown("<div class='sticky-wrap'></div>", unsafe_allow_html=True)
@@ -577,7 +938,8 @@ with main_tab:
         with c1:
             if st.button("🔄 Reset Day"):
                 st.session_state.workout_data[day] = {}
-                save_state()
+                progress_reset(day)
+                save_state(day)
                 safe_toast("Day reset.")
         with c2:
             if st.button("⏱️ 60s Rest"):
@@ -597,7 +959,7 @@ with main_tab:
                     entry = {
                         "date": datetime.utcnow().isoformat(),
                         "day": day,
-                        "workout_name": WORKOUT_TEMPLATES[day]["title"],
+                        "workout_name": plan.title,
                         "completed_sets": d,
                         "total_sets": t,
                         "completion_percentage": p,
@@ -605,21 +967,29 @@ with main_tab:
                         "meta": {
                             "schema": SCHEMA_VERSION,
                             "duration_sec": (datetime.utcnow() - datetime.fromisoformat(st.session_state.workout_started_at)).seconds,
-                            "name_map": name_map,
+                            "name_map": dict(plan.name_map),
                             "deload": st.session_state.deload_mode,
                         },
                     }
-                    st.session_state.history.append(entry)
-                    save_json(WORKOUT_HISTORY_FILE, st.session_state.history)
-                    st.session_state.workout_data[day] = {}
-                    st.session_state.workout_started_at = datetime.utcnow().isoformat()
-                    save_state()
-                    try:
-                        if st.session_state.confetti_on_save:
-                            st.balloons()
-                    except Exception:
-                        pass
-                    st.success("Saved to history.")
+                    if save_history_entry(entry):
+                        index = st.session_state.exercise_index
+                        if index["_count"] + 1 == len(st.session_state.history):
+                            core.index_entry(index, entry)
+                            index["_version"] = st.session_state.history_version
+                            save_json(WORKOUT_INDEX_FILE, index)
+                        else:
+                            # Other sessions saved too; rebuild against the merged history next rerun
+                            st.session_state.pop("exercise_index", None)
+                        st.session_state.workout_data[day] = {}
+                        progress_reset(day)
+                        st.session_state.workout_started_at = datetime.utcnow().isoformat()
+                        save_state(day)
+                        try:
+                            if st.session_state.confetti_on_save:
+                                st.balloons()
+                        except Exception:
+                            pass
+                        st.success("Saved to history.")
         st.markdown("</div>", unsafe_allow_html=True)
 
     rest_widget()
@@ -627,43 +997,171 @@ with main_tab:
 # =============================================================
 # Analytics tab
 # =============================================================
-with analytics_tab:
+# Memoized process-wide on the history version with bounded eviction. The
+# leading underscore keeps the history itself out of Streamlit's arg hashing;
+# cache_resource hands back the same objects (no deep copy per rerun).
+
+@st.cache_resource(max_entries=ANALYTICS_CACHE_ENTRIES, show_spinner=False)
+@perf.timed("analytics_frames")
+def analytics_frames(version, _history):
+    df = pd.DataFrame([packed.summary(e) for e in _history])
+    df["date"] = analytics.to_datetime(df["date"])
+    weekly = pd.DataFrame(
+        core.weekly_rows(functools.reduce(core.weekly_entry, _history, {})),
+        columns=["year", "week", "day", "completed_sets"],
+    )
+    comp = df.sort_values("date")
+    return weekly, comp
+
+
+@st.cache_resource(max_entries=ANALYTICS_CACHE_ENTRIES, show_spinner=False)
+@perf.timed("figure:weekly")
+def weekly_output_figure(version, _history):
+    weekly, _ = analytics_frames(version, _history)
+    fig = go.Figure()
+    for day_name in weekly["day"].unique():
+        subset = weekly[weekly["day"] == day_name]
+        fig.add_trace(go.Bar(x=subset["week"].astype(str), y=subset["completed_sets"], name=day_name.title()))
+    fig.update_layout(barmode="group", title="Completed Sets per Week", xaxis_title="ISO Week", yaxis_title="Sets")
+    return fig
+
+
+@st.cache_resource(max_entries=ANALYTICS_CACHE_ENTRIES, show_spinner=False)
+@perf.timed("figure:completion")
+def completion_figure(version, _history):
+    _, comp = analytics_frames(version, _history)
+    x, y = analytics.downsample(comp["date"].to_numpy(), comp["completion_percentage"].to_numpy(dtype="float64"), CHART_MAX_POINTS)
+    fig = go.Figure(go.Scattergl(x=x, y=y, mode="lines+markers"))
+    fig.update_layout(yaxis_title="Completion %", xaxis_title="Date")
+    return fig
+
+
+@st.cache_resource(max_entries=ANALYTICS_CACHE_ENTRIES, show_spinner=False)
+@perf.timed("pr_table")
+def pr_table(version, _index):
+    rows = core.pr_rows(_index)
+    return pd.DataFrame(rows, columns=["Exercise", "Max Load (kg)", "Set on"]) if rows else None
+
+
+@st.cache_resource(max_entries=ANALYTICS_CACHE_ENTRIES, show_spinner=False)
+@perf.timed("progression_tips")
+def progression_tips(version, _history):
+    return core.progression_tips(core.recent_sessions(_history))
+
+
+@st.cache_resource(show_spinner=False)
+def get_analytics_engine(store_key, cache_dir):
+    # One per store, shared by all sessions; backed by the on-disk per-set cache
+    return analytics.AnalyticsEngine(cache_dir)
+
+
+def analytics_engine():
+    engine = get_analytics_engine(HISTORY_STORE.key, WORKOUT_SETS_DIR)
+    with perf.span("analytics_engine"):
+        engine.update(st.session_state.history, st.session_state.history_version)
+    return engine
+
+
+@st.cache_resource(max_entries=ANALYTICS_CACHE_ENTRIES, show_spinner=False)
+@perf.timed("figure:category_volume")
+def category_volume_figure(version, _engine):
+    weekly = _engine.metric("weekly_volume", analytics.weekly_volume)
+    weekly = weekly[weekly["week_start"] > weekly["week_start"].max() - pd.Timedelta(weeks=ANALYTICS_WEEKS)]
+    fig = go.Figure()
+    for cat in [c for c in analytics.CATEGORIES if c in set(weekly["category"])]:
+        subset = weekly[weekly["category"] == cat]
+        fig.add_trace(go.Bar(x=subset["week_start"], y=subset["sets"], name=cat, customdata=subset["tonnage"],
+                             hovertemplate="%{y} sets · %{customdata:,.0f} kg<extra>" + cat + "</extra>"))
+    fig.update_layout(barmode="stack", xaxis_title="Week of", yaxis_title="Done sets")
+    return fig
+
+
+@st.cache_resource(max_entries=ANALYTICS_CACHE_ENTRIES, show_spinner=False)
+@perf.timed("figure:acwr")
+def acwr_figure(version, _engine):
+    acwr = _engine.metric("acwr", analytics.acute_chronic, "tonnage").tail(ACWR_DAYS)
+    fig = go.Figure(go.Scatter(x=acwr.index, y=acwr["ratio"], mode="lines", name="Acute:chronic"))
+    fig.add_hrect(y0=0.8, y1=1.3, fillcolor="#10B981", opacity=0.12, line_width=0)
+    fig.update_layout(yaxis_title="7d : 28d tonnage", xaxis_title="Date", showlegend=False)
+    return fig
+
+
+@st.cache_resource(max_entries=ANALYTICS_CACHE_ENTRIES, show_spinner=False)
+@perf.timed("figure:exercise_trend")
+def exercise_trend_figure(version, exercise, _engine):
+    sessions = _engine.metric("exercise_sessions", analytics.exercise_sessions)
+    trend = analytics.exercise_trend(sessions, exercise, CHART_MAX_POINTS)
+    fig = go.Figure()
+    for metric, label, axis in (("weight", "Top load (kg)", "y"), ("e1rm", "e1RM (kg)", "y"), ("rpe", "Top RPE", "y2")):
+        x, y = trend[metric]
+        if len(x):
+            fig.add_trace(go.Scattergl(x=x, y=y, name=label, yaxis=axis, mode="lines+markers" if axis == "y" else "markers"))
+    fig.update_layout(
+        xaxis_title="Date",
+        yaxis_title="kg",
+        yaxis2=dict(title="RPE", overlaying="y", side="right", range=[0, 10.5], showgrid=False),
+        legend=dict(orientation="h", y=-0.25),
+    )
+    return fig
+
+
+def render_training_load(version):
+    engine = analytics_engine()
+    acwr = engine.metric("acwr", analytics.acute_chronic, "tonnage")
+    st.markdown("<div class='section-head'>Training Load (acute:chronic)</div>", unsafe_allow_html=True)
+    ratio = acwr["ratio"].iloc[-1] if len(acwr) else float("nan")
+    if ratio == ratio:  # not NaN: at least four weeks of history
+        m1, m2, m3 = st.columns(3)
+        m1.metric("7‑day tonnage", f"{acwr['acute'].iloc[-1]:,.0f} kg")
+        m2.metric("28‑day weekly avg", f"{acwr['chronic'].iloc[-1]:,.0f} kg")
+        m3.metric("Ratio", f"{ratio:.2f}")
+        st.plotly_chart(acwr_figure(version, engine), use_container_width=True)
+        st.caption("0.8–1.3 (shaded) is the usual sweet spot; spikes above ~1.5 are a cue to deload.")
+    else:
+        st.caption("Needs four weeks of logged loads.")
+
+    st.markdown("<div class='section-head'>Weekly Volume by Category</div>", unsafe_allow_html=True)
+    st.plotly_chart(category_volume_figure(version, engine), use_container_width=True)
+
+    st.markdown("<div class='section-head'>Estimated 1RM</div>", unsafe_allow_html=True)
+    e1rm = engine.metric("e1rm", analytics.e1rm_table)
+    if len(e1rm):
+        st.dataframe(
+            e1rm.assign(e1rm=e1rm["e1rm"].round(1), date=e1rm["date"].dt.strftime("%Y-%m-%d")).rename(columns={
+                "exercise": "Exercise", "e1rm": "e1RM (kg)", "weight": "Load (kg)", "reps": "Reps", "rpe": "RPE", "date": "Set on",
+            }),
+            use_container_width=True,
+            hide_index=True,
+        )
+        st.caption("Epley estimate; RPE counts reps in reserve. Reps default to the template's prescription.")
+    else:
+        st.caption("Log loads to estimate 1RMs.")
+
+    st.markdown("<div class='section-head'>Exercise Trends</div>", unsafe_allow_html=True)
+    sessions = engine.metric("exercise_sessions", analytics.exercise_sessions)
+    names = sorted(sessions["exercise"].astype(str).unique())
+    if names:
+        exercise = st.selectbox("Exercise", names, key="trend_exercise")
+        st.plotly_chart(exercise_trend_figure(version, exercise, engine), use_container_width=True)
+        st.caption(f"Per session: heaviest done set, its best e1RM, and the top RPE; long ranges are reduced to {CHART_MAX_POINTS} points per line.")
+    else:
+        st.caption("Log loads to see per‑exercise trends.")
+
+
+def render_analytics():
     st.markdown("<div class='section-head'>Weekly Output</div>", unsafe_allow_html=True)
     if len(st.session_state.history) == 0:
         st.info("Complete and save a workout to see analytics.")
     else:
-        df = pd.DataFrame(st.session_state.history)
-        df["date"] = pd.to_datetime(df["date"]) 
-        df["week"] = df["date"].dt.isocalendar().week
-        df["year"] = df["date"].dt.isocalendar().year
-
-        weekly = df.groupby(["year", "week", "day"], as_index=False)["completed_sets"].sum()
-        fig = go.Figure()
-        for day_name in weekly["day"].unique():
-            subset = weekly[weekly["day"] == day_name]
-            fig.add_trace(go.Bar(x=subset["week"].astype(str), y=subset["completed_sets"], name=day_name.title()))
-        fig.update_layout(barmode="group", title="Completed Sets per Week", xaxis_title="ISO Week", yaxis_title="Sets")
-        st.plotly_chart(fig, use_container_width=True)
+        version = st.session_state.history_version
+        st.plotly_chart(weekly_output_figure(version, st.session_state.history), use_container_width=True)
 
         st.markdown("<div class='section-head'>Completion % over Time</div>", unsafe_allow_html=True)
-        comp = df.sort_values("date")
-        fig2 = go.Figure(go.Scatter(x=comp["date"], y=comp["completion_percentage"], mode="lines+markers"))
-        fig2.update_layout(yaxis_title="Completion %", xaxis_title="Date")
-        st.plotly_chart(fig2, use_container_width=True)
+        st.plotly_chart(completion_figure(version, st.session_state.history), use_container_width=True)
 
         # Progression tips: suggest load bump if all sets logged <= RPE 7
         st.markdown("<div class='section-head'>Progression Tips</div>", unsafe_allow_html=True)
-        tips = []
-        # look at last 5 sessions
-        for entry in sorted(st.session_state.history, key=lambda x: x["date"], reverse=True)[:5]:
-            name_map = entry.get("meta", {}).get("name_map", {})
-            for ex_key, sets_map in entry.get("data", {}).items():
-                ex_name = name_map.get(ex_key)
-                if not ex_name:
-                    continue
-                rpes = [slot.get("rpe") for slot in sets_map.values() if isinstance(slot, dict) and slot.get("rpe") is not None]
-                if rpes and max(rpes) <= 7 and ex_name.lower().split()[0] in ("goblet", "bulgarian", "single‑leg", "hip", "overhead", "calf"):
-                    tips.append(f"Increase load next time on **{ex_name}** by 0.5–2.5kg if form is solid (last session all sets ≤ RPE 7).")
+        tips = progression_tips(version, st.session_state.history)
         if tips:
             for t in tips[:8]:
                 st.write("• ", t)
@@ -671,23 +1169,54 @@ with analytics_tab:
             st.caption("Log RPEs to unlock auto‑progression suggestions.")
 
         st.markdown("<div class='section-head'>Personal Records (by Load)</div>", unsafe_allow_html=True)
-        PRS = compute_prs()
-        prs_rows = sorted([(k, v) for k, v in PRS.items()], key=lambda x: x[0])
-        if prs_rows:
-            st.dataframe(pd.DataFrame(prs_rows, columns=["Exercise", "Max Load (kg)"]), use_container_width=True, hide_index=True)
+        prs_df = pr_table(version, EXERCISE_INDEX)
+        if prs_df is not None:
+            st.dataframe(prs_df, use_container_width=True, hide_index=True)
         else:
             st.caption("No PRs yet — log some weights!")
 
+        render_training_load(version)
+
 # =============================================================
 # History tab
 # =============================================================
-with history_tab:
+def render_history():
     st.markdown("<div class='section-head'>Recent Workouts</div>", unsafe_allow_html=True)
     if len(st.session_state.history) == 0:
         st.info("No history yet.")
     else:
-        for item in sorted(st.session_state.history, key=lambda x: x["date"], reverse=True)[:30]:
-            d = pd.to_datetime(item["date"]).strftime("%b %d, %Y – %H:%M")
+        first = history_date_index()[0][0][:10]
+        last = history_date_index()[-1][0][:10]
+        picked = st.date_input(
+            "Date range",
+            value=(datetime.fromisoformat(first).date(), datetime.fromisoformat(last).date()),
+            min_value=datetime.fromisoformat(first).date(),
+            max_value=datetime.fromisoformat(last).date(),
+        )
+        picked = picked if isinstance(picked, (list, tuple)) else (picked,)
+        start = picked[0].isoformat() if len(picked) > 0 else None
+        end = picked[1].isoformat() if len(picked) > 1 else None
+        if st.session_state.get("history_range") != (start, end):
+            st.session_state.history_range = (start, end)
+            st.session_state.history_page = 0
+
+        page = st.session_state.get("history_page", 0)
+        items, total = history_page(page, HISTORY_PAGE_SIZE, start, end)
+        pages = max(1, -(-total // HISTORY_PAGE_SIZE))
+        n1, n2, n3 = st.columns([1, 2, 1])
+        with n1:
+            if st.button("← Newer", disabled=page == 0, key="hist_newer"):
+                st.session_state.history_page = page - 1
+                safe_rerun()
+        with n2:
+            st.caption(f"Page {page + 1} of {pages} · {total} sessions")
+        with n3:
+            if st.button("Older →", disabled=page + 1 >= pages, key="hist_older"):
+                st.session_state.history_page = page + 1
+                safe_rerun()
+
+        for item in items:
+            d = datetime.fromisoformat(item["date"]).strftime("%b %d, %Y – %H:%M")
             dur = item.get("meta", {}).get("duration_sec")
             deload = item.get("meta", {}).get("deload")
             deload_tag = " • Deload" if deload else ""
@@ -698,21 +1227,53 @@ with history_tab:
             )
             c1, c2 = st.columns([1,1])
             with c1:
-                with st.expander("Details"):
+                # Details are only serialized for the one entry that is open
+                is_open = st.session_state.get("history_open") == item["date"]
+                if st.button("Hide details" if is_open else "Details", key=f"det_{item['date']}"):
+                    st.session_state.history_open = None if is_open else item["date"]
+                    safe_rerun()
+                if is_open:
                     st.json(item.get("data", {}))
             with c2:
                 if st.button("Duplicate as Today", key=f"dup_{item['date']}"):
                     prefill = {}
                     for ex_key, sets_map in item.get("data", {}).items():
-                        prefill[ex_key] = {s: {"done": False, "weight": None, "reps": None, "rpe": None} for s in sets_map.keys()}
+                        prefill[ex_key] = {s: empty_slot() for s in sets_map.keys()}
                     st.session_state.workout_data[st.session_state.selected_day] = prefill
-                    save_state()
+                    progress_reset(st.session_state.selected_day)
+                    save_state(st.session_state.selected_day)
                     safe_toast("Loaded past structure for today.")
 
+# =============================================================
+# Performance panel (debug)
+# =============================================================
+def render_perf_panel():
+    runs = st.session_state.get("perf_runs", [])
+    st.session_state.perf_trace_file = ui_toggle(
+        f"Append reruns to {os.path.basename(PERF_TRACE_FILE)}", value=bool(st.session_state.get("perf_trace_file"))
+    )
+    if not runs:
+        st.caption("No finished reruns yet — interact with the app and come back.")
+        return
+    st.caption(f"Last {len(runs)} reruns, newest first · ms per span (calls)")
+    rows = []
+    for run in reversed(runs):
+        row = {
+            "view": run["label"],
+            "total ms": run["total_ms"],
+            "writes": run["writes"],
+            "bytes": run["bytes_written"],
+        }
+        for name, span in sorted(run["spans"].items()):
+            row[name] = f"{span['ms']:.1f} ({span['calls']})"
+        rows.append(row)
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+
+
 # =============================================================
 # Settings tab
 # =============================================================
-with settings_tab:
+def render_settings():
     st.markdown("<div class='section-head'>Preferences</div>", unsafe_allow_html=True)
     col1, col2 = st.columns(2)
     with col1:
@@ -721,8 +1282,13 @@ with settings_tab:
         st.session_state.deload_mode = ui_toggle("Deload mode (reduce sets)", value=bool(st.session_state.deload_mode))
         st.caption("Use deload in recovery weeks or when legs feel beat up from running.")
     with col2:
+        athlete = st.text_input("Athlete", value=st.session_state.athlete, help="Each athlete has separate workouts and history.")
+        if athlete_id(athlete) != st.session_state.athlete:
+            switch_athlete(athlete)
         st.session_state.confetti_on_save = ui_toggle("🎉 Confetti on save", value=bool(st.session_state.confetti_on_save))
         st.caption("Because progress should feel fun.")
+        st.session_state.compact_layout = ui_toggle("📱 Compact workout view", value=bool(st.session_state.compact_layout))
+        st.caption("Inputs for the next set only; finished exercises collapse. ↺ un‑marks an exercise's last done set. Lighter on slow connections.")
 
     st.divider()
     st.markdown("<div class='section-head'>Runner‑specific Scheduling</div>", unsafe_allow_html=True)
@@ -738,25 +1304,83 @@ with settings_tab:
 
     st.divider()
     st.markdown("<div class='section-head'>Data</div>", unsafe_allow_html=True)
+    export_fmt = st.selectbox(
+        "Export format",
+        list(storage.EXPORT_FORMATS),
+        format_func=lambda f: {"json": "Pretty JSON", "ndjson": "NDJSON (compact)", "json.gz": "Pretty JSON · gzip", "ndjson.gz": "NDJSON · gzip"}[f],
+    )
     cA, cB, cC = st.columns(3)
     with cA:
-        st.download_button(
-            label="⬇️ Download history.json",
-            data=json.dumps(st.session_state.history, indent=2),
-            file_name="workout_history.json",
-            mime="application/json",
-            use_container_width=True,
+        file_name, mime = storage.EXPORT_FORMATS[export_fmt]
+        history = st.session_state.history
+
+        @perf.timed("export")
+        def build_export():
+            buf = storage.export_history(history, export_fmt, io.BytesIO())
+            buf.seek(0)
+            return buf
+
+        ui_download_button(
+            f"⬇️ Download {file_name}",
+            build_export,
+            file_name=file_name,
+            mime=mime,
+            key=f"export_{export_fmt}",
         )
     with cB:
         if st.button("🗑️ Clear History", use_container_width=True):
-            st.session_state.history = []
-            save_json(WORKOUT_HISTORY_FILE, [])
+            clear_history_file()
+            st.session_state.exercise_index = dict(core.empty_exercise_index(), _version=st.session_state.history_version)
+            save_json(WORKOUT_INDEX_FILE, st.session_state.exercise_index)
             st.success("History cleared.")
     with cC:
         if st.button("🧹 Clear Today", use_container_width=True):
             st.session_state.workout_data[st.session_state.selected_day] = {}
-            save_state()
+            progress_reset(st.session_state.selected_day)
+            save_state(st.session_state.selected_day)
             safe_toast("Cleared today's sets.")
 
     st.caption("Schema v4 – 3‑day split, 30‑min cap, deload toggle, progression tips, tendon stiffness focus.")
 
+    if get_query_param("debug", "") != "perf":  # shown below every view in that case
+        with st.expander("🛠️ Performance"):
+            render_perf_panel()
+
+# =============================================================
+# Navigation — "sections" runs only the active view; "tabs" renders all
+# =============================================================
+SECTIONS = {
+    "workout": ("🏋️ Workout", render_workout),
+    "analytics": ("📊 Analytics", render_analytics),
+    "history": ("📅 History", render_history),
+    "settings": ("⚙️ Settings", render_settings),
+}
+
+if NAV_MODE == "tabs":
+    for tab, (key, (_, render)) in zip(st.tabs([label for label, _ in SECTIONS.values()]), SECTIONS.items()):
+        with tab, perf.span(f"render:{key}"):
+            render()
+else:
+    if "section" not in st.session_state:
+        st.session_state.section = get_query_param("view", "workout")
+    section = ui_segmented(
+        "Section",
+        options=list(SECTIONS),
+        default=st.session_state.section,
+        format_func=lambda k: SECTIONS[k][0],
+    ) or st.session_state.section  # segmented control returns None when the active item is re-clicked
+    if section not in SECTIONS:
+        section = "workout"
+    st.session_state.section = section
+    set_query_param("view", section)
+    with perf.span(f"render:{section}"):
+        SECTIONS[section][1]()
+
+if get_query_param("debug", "") == "perf":
+    st.divider()
+    st.markdown("<div class='section-head'>🛠️ Performance</div>", unsafe_allow_html=True)
+    render_perf_panel()
+
+# Single coalesced write for everything changed during this rerun
+flush_state()
+finish_trace()